@@ -1,3 +1,8 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -5,6 +10,8 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from .config import settings
 
+logger = logging.getLogger(__name__)
+
 # ======================
 # CONFIG (from environment)
 # ======================
@@ -16,23 +23,151 @@ REFRESH_TOKEN_EXPIRE_DAYS = settings.REFRESH_TOKEN_EXPIRE_DAYS
 # ======================
 # PASSWORD HASHING
 # ======================
+# Hashes made with other parameters are upgraded on the next successful login
 pwd_context = CryptContext(
     schemes=["argon2"],
-    deprecated="auto"
+    deprecated="auto",
+    argon2__rounds=settings.ARGON2_TIME_COST,
+    argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+    argon2__parallelism=settings.ARGON2_PARALLELISM,
 )
 
 
+# argon2 costs tens of milliseconds and a large memory block per call, so
+# hashes run on a small dedicated pool: at most PASSWORD_HASH_WORKERS run at
+# once and at most PASSWORD_HASH_MAX_PENDING wait, beyond that we answer 503.
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+_hash_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_MAX_PENDING)
+_hash_stats_lock = threading.Lock()
+_hash_stats = {
+    "queued": 0,
+    "running": 0,
+    "completed": 0,
+    "rejected": 0,
+    "total_seconds": 0.0,
+    "max_seconds": 0.0,
+}
+
+
+def _run_timed(func, *args):
+    with _hash_stats_lock:
+        _hash_stats["queued"] -= 1
+        _hash_stats["running"] += 1
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        elapsed = time.perf_counter() - start
+        with _hash_stats_lock:
+            _hash_stats["running"] -= 1
+            _hash_stats["completed"] += 1
+            _hash_stats["total_seconds"] += elapsed
+            _hash_stats["max_seconds"] = max(_hash_stats["max_seconds"], elapsed)
+
+
+def _on_hash_done(future: Future) -> None:
+    if future.cancelled():
+        with _hash_stats_lock:
+            _hash_stats["queued"] -= 1
+    _hash_slots.release()
+
+
+def _submit_hash_job(func, *args) -> Future:
+    if not _hash_slots.acquire(blocking=False):
+        with _hash_stats_lock:
+            _hash_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again"
+        )
+    with _hash_stats_lock:
+        _hash_stats["queued"] += 1
+    try:
+        future = _hash_executor.submit(_run_timed, func, *args)
+    except Exception:
+        with _hash_stats_lock:
+            _hash_stats["queued"] -= 1
+        _hash_slots.release()
+        raise
+    future.add_done_callback(_on_hash_done)
+    return future
+
+
+def get_password_hash_stats() -> dict:
+    """Queue depth and latency of the password hashing pool"""
+    with _hash_stats_lock:
+        stats = dict(_hash_stats)
+    stats["avg_seconds"] = stats["total_seconds"] / stats["completed"] if stats["completed"] else 0.0
+    stats["workers"] = settings.PASSWORD_HASH_WORKERS
+    stats["max_pending"] = settings.PASSWORD_HASH_MAX_PENDING
+    stats["profile"] = {
+        "time_cost": settings.ARGON2_TIME_COST,
+        "memory_cost_kib": settings.ARGON2_MEMORY_COST,
+        "parallelism": settings.ARGON2_PARALLELISM,
+    }
+    stats["benchmark"] = _hash_benchmark
+    return stats
+
+
+_hash_benchmark: dict | None = None
+
+
+def benchmark_password_hash(samples: int = 3) -> dict:
+    """Measure per-hash latency of the configured argon2 profile"""
+    global _hash_benchmark
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        pwd_context.hash("benchmark-password")
+        timings.append(time.perf_counter() - start)
+
+    _hash_benchmark = {
+        "samples": samples,
+        "avg_seconds": sum(timings) / samples,
+        "max_seconds": max(timings),
+    }
+    logger.info(
+        "argon2 profile t=%d m=%dKiB p=%d: %.1f ms per hash",
+        settings.ARGON2_TIME_COST, settings.ARGON2_MEMORY_COST,
+        settings.ARGON2_PARALLELISM, _hash_benchmark["avg_seconds"] * 1000
+    )
+    return _hash_benchmark
+
+
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return _submit_hash_job(pwd_context.hash, password).result()
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _submit_hash_job(pwd_context.verify, plain_password, hashed_password).result()
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Verify a password and return a new hash if the stored one uses stale parameters"""
+    return _submit_hash_job(pwd_context.verify_and_update, plain_password, hashed_password).result()
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password for async handlers, without blocking the event loop"""
+    return await asyncio.wrap_future(_submit_hash_job(pwd_context.hash, password))
 
 
 # ======================
 # JWT TOKENS
 # ======================
+def token_claims(user) -> dict:
+    """بيانات المستخدم داخل الـ Token (المعرف ونسخة الـ Token)"""
+    return {
+        "sub": user.email,
+        "role": user.role,
+        "uid": user.id,
+        "ver": user.token_version or 0,
+    }
+
+
 def create_access_token(data: dict) -> str:
     """إنشاء Access Token (صلاحية قصيرة)"""
     to_encode = data.copy()
@@ -93,14 +228,10 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
             detail="Invalid token",
         )
 
-    return {"email": email, "role": role}
-
-
-def require_admin(user: dict = Depends(get_current_user)) -> dict:
-    """التحقق من صلاحيات المشرف"""
-    if user["role"] != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admins only"
-        )
-    return user
\ No newline at end of file
+    # Legacy tokens carry only the email; they have no "uid"/"ver" claims
+    return {
+        "email": email,
+        "role": role,
+        "id": payload.get("uid"),
+        "token_version": payload.get("ver"),
+    }
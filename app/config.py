@@ -11,6 +11,75 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str = "sqlite:///./test.db"
+    # Sync and async engines keep separate pools, so one worker process can
+    # open up to DB_POOL_SIZE + DB_MAX_OVERFLOW + DB_ASYNC_POOL_SIZE +
+    # DB_ASYNC_MAX_OVERFLOW connections (45 by default); size Postgres'
+    # max_connections for that times the number of workers
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_ASYNC_POOL_SIZE: int = 5
+    DB_ASYNC_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced
+    DB_POOL_PRE_PING: bool = True
+
+    # Password hashing (argon2 runs in its own bounded thread pool)
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536  # KiB
+    ARGON2_PARALLELISM: int = 4
+    ARGON2_BENCHMARK_ON_STARTUP: bool = True
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+
+    # Push notifications
+    FCM_MAX_PARALLEL_BATCHES: int = 4
+
+    # Outbound job queue (emails, pushes)
+    JOB_WORKER_IN_PROCESS: bool = True  # set False when running `python -m app.worker`
+    JOB_POLL_INTERVAL_SECONDS: float = 2.0
+    JOB_BATCH_SIZE: int = 20
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_SECONDS: int = 30
+    JOB_LOCK_TIMEOUT_SECONDS: int = 600
+    JOB_RETENTION_DAYS: int = 7  # done jobs older than this are deleted; failed ones are kept
+    JOB_CLEANUP_INTERVAL_SECONDS: int = 3600
+
+    # Current-user cache (per worker process)
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_SIZE: int = 2048
+
+    # Uploads
+    MAX_UPLOAD_SIZE: int = 5 * 1024 * 1024  # bytes, per file
+    IMAGE_PROCESS_WORKERS: int = 2
+    IMAGE_MAX_DIMENSION: int = 1920  # px, longest side
+    IMAGE_FORMAT: str = "WEBP"  # WEBP or JPEG
+    IMAGE_QUALITY: int = 80
+    IMAGE_THUMBNAIL_SIZES: list[int] = [160, 480]
+
+    # File storage: "local" (served from /static) or "s3" (any S3-compatible service)
+    STORAGE_BACKEND: str = "local"
+    STORAGE_LOCAL_ROOT: str = "app/static"
+    STORAGE_PUBLIC_BASE_URL: str = "https://api.sdotist.org/static"
+    STORAGE_PRIVATE_URL_EXPIRES_SECONDS: int = 900  # lifetime of signed links to documents/
+    S3_BUCKET: str = ""
+    S3_PRIVATE_BUCKET: str = ""  # non-public bucket for documents/; S3_BUCKET when empty (then keep documents/ out of its public policy)
+    S3_ENDPOINT_URL: str | None = None  # e.g. http://minio:9000; None for AWS
+    S3_REGION: str | None = None
+    S3_ACCESS_KEY_ID: str | None = None
+    S3_SECRET_ACCESS_KEY: str | None = None
+    S3_PUBLIC_BASE_URL: str | None = None  # CDN or public bucket URL
+    S3_PRESIGN_EXPIRES_SECONDS: int = 900
+
+    # QR codes for /users/me/barcode
+    QR_CACHE_DIR: str = "/tmp/sdotist-qr-cache"
+    QR_CACHE_MAX_SIZE: int = 4096  # barcodes kept in memory per worker
+    QR_CACHE_TTL_SECONDS: int = 86400  # in memory, and max age of files in QR_CACHE_DIR
+    QR_DISK_CACHE_MAX_FILES: int = 20000
+
+    # Ed25519 private key signing offline check-in manifests (PEM or base64
+    # 32-byte seed; derived from SECRET_KEY when empty). It stays on the
+    # server: scanners verify with the public key from /events/check-in/public-key
+    CHECKIN_MANIFEST_PRIVATE_KEY: str = ""
 
     # App Settings
     APP_NAME: str = "User Management API"
@@ -24,6 +93,7 @@ class Settings(BaseSettings):
     MAIL_SERVER: str = "smtp.zoho.sa"
     MAIL_STARTTLS: bool = False
     MAIL_SSL_TLS: bool = True
+    MAIL_IDLE_TIMEOUT_SECONDS: float = 60  # close the pooled SMTP session after this much idle time
 
     model_config = SettingsConfigDict(env_file=".env")
 
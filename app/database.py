@@ -1,5 +1,10 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, NullPool
 from .config import settings
 
 DATABASE_URL = settings.DATABASE_URL
@@ -8,22 +13,170 @@ connect_args = {}
 if "sqlite" in DATABASE_URL:
     connect_args = {"check_same_thread": False}
 
+
+# ======================
+# POOL STATISTICS
+# ======================
+_pool_stats_lock = threading.Lock()
+_pool_stats = {
+    "checkouts": 0,
+    "checkins": 0,
+    "connects": 0,
+    "timeouts": 0,
+    "total_wait_seconds": 0.0,
+    "max_wait_seconds": 0.0,
+}
+
+
+class _TimedCheckoutMixin:
+    """Records how long each pool checkout waited for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with _pool_stats_lock:
+                _pool_stats["timeouts"] += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with _pool_stats_lock:
+                _pool_stats["total_wait_seconds"] += waited
+                _pool_stats["max_wait_seconds"] = max(_pool_stats["max_wait_seconds"], waited)
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _pool_kwargs(poolclass, pool_size: int, max_overflow: int) -> dict:
+    kwargs = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+    if ":memory:" not in DATABASE_URL:
+        kwargs.update(
+            poolclass=poolclass,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    return kwargs
+
+
+def _async_database_url(url: str) -> str:
+    """Map the sync DATABASE_URL onto its asyncio driver"""
+    scheme, _, rest = url.partition("://")
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+    if scheme.startswith("postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+
 engine = create_engine(
     DATABASE_URL,
-    connect_args=connect_args
+    connect_args=connect_args,
+    **_pool_kwargs(InstrumentedQueuePool, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
 )
 
+# SQLite connections are cheap and aiosqlite connections must not outlive
+# the event loop that opened them, so the async engine only pools for Postgres.
+# Its pool is separate from the sync one and has its own (smaller) budget:
+# see max_connections_per_worker().
+if "sqlite" in DATABASE_URL:
+    async_engine = create_async_engine(_async_database_url(DATABASE_URL), poolclass=NullPool)
+else:
+    async_engine = create_async_engine(
+        _async_database_url(DATABASE_URL),
+        **_pool_kwargs(InstrumentedAsyncQueuePool, settings.DB_ASYNC_POOL_SIZE, settings.DB_ASYNC_MAX_OVERFLOW)
+    )
+
+
+def _on_connect(dbapi_connection, connection_record):
+    with _pool_stats_lock:
+        _pool_stats["connects"] += 1
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    with _pool_stats_lock:
+        _pool_stats["checkouts"] += 1
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    with _pool_stats_lock:
+        _pool_stats["checkins"] += 1
+
+
+for _engine in (engine, async_engine.sync_engine):
+    event.listen(_engine, "connect", _on_connect)
+    event.listen(_engine, "checkout", _on_checkout)
+    event.listen(_engine, "checkin", _on_checkin)
+
+
+def max_connections_per_worker() -> int:
+    """Upper bound of database connections one worker process can hold (sync + async pools)"""
+    return (
+        settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+        + settings.DB_ASYNC_POOL_SIZE + settings.DB_ASYNC_MAX_OVERFLOW
+    )
+
+
+def _pool_occupancy(pool, max_overflow: int) -> dict:
+    if not isinstance(pool, QueuePool):
+        return {}
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": max_overflow,
+    }
+
+
+def get_pool_stats() -> dict:
+    """Snapshot of pool sizing and checkout/wait counters"""
+    with _pool_stats_lock:
+        stats = dict(_pool_stats)
+    stats["avg_wait_seconds"] = stats["total_wait_seconds"] / stats["checkouts"] if stats["checkouts"] else 0.0
+    stats.update(_pool_occupancy(engine.pool, settings.DB_MAX_OVERFLOW))
+    stats["async"] = _pool_occupancy(async_engine.pool, settings.DB_ASYNC_MAX_OVERFLOW)
+    stats["max_connections_per_worker"] = max_connections_per_worker()
+    return stats
+
+
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
     bind=engine
 )
 
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
 def get_db():
+    """
+    The one session dependency for the app. FastAPI caches dependencies per
+    request, so auth dependencies and the handler share this session (and its
+    pooled connection) as long as they all depend on this function.
+    """
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,60 +1,126 @@
 from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
 
-from .auth import SECRET_KEY, ALGORITHM
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
-
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+from . import auth
+from .database import get_db
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models import User
+from .schemas import CurrentUser
+from .cache import user_cache
 
-        email: str | None = payload.get("sub")
-        role: str | None = payload.get("role", "user")
 
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
+def _cache_key(current_user: dict):
+    # Id-carrying tokens are keyed by user id, legacy tokens by email
+    if current_user.get("id") is not None:
+        return current_user["id"]
+    return current_user["email"]
 
-        return {
-            "email": email,
-            "role": role
-        }
 
-    except JWTError:
+def _check_token_version(token_version: int | None, current_user: dict) -> None:
+    # Legacy tokens predate versioning: they count as version 0, so the first
+    # password or role change revokes them like any other token
+    expected = current_user.get("token_version") or 0
+    if expected != (token_version or 0):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
+            detail="Token has been revoked"
         )
 
 
-def admin_only(user=Depends(get_current_user)):
-    if user["role"] != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admins only"
-        )
+def load_user(db: Session, current_user: dict) -> User | None:
+    """Load the user row for a token: primary key for new tokens, email for legacy ones"""
+    if current_user.get("id") is not None:
+        user = db.get(User, current_user["id"])
+    else:
+        user = db.query(User).filter(User.email == current_user["email"]).first()
+    if user:
+        _check_token_version(user.token_version, current_user)
     return user
 
-from .database import SessionLocal
-from sqlalchemy.orm import Session
-from .models import User
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+async def load_user_async(db: AsyncSession, current_user: dict) -> User | None:
+    """Same as ``load_user`` for async handlers"""
+    if current_user.get("id") is not None:
+        user = await db.get(User, current_user["id"])
+    else:
+        result = await db.execute(select(User).where(User.email == current_user["email"]))
+        user = result.scalar_one_or_none()
+    if user:
+        _check_token_version(user.token_version, current_user)
+    return user
+
+
+def resolve_user(db: Session, current_user: dict) -> CurrentUser | None:
+    """Resolve a token to a user snapshot, from cache when possible"""
+    key = _cache_key(current_user)
+    cached = user_cache.get(key)
+    if cached is not None:
+        _check_token_version(cached.token_version, current_user)
+        return cached
+
+    user = load_user(db, current_user)
+    if not user:
+        return None
+    snapshot = CurrentUser.model_validate(user)
+    user_cache.set(key, snapshot)
+    return snapshot
+
+
+async def resolve_user_async(db: AsyncSession, current_user: dict) -> CurrentUser | None:
+    """Same as ``resolve_user`` for async handlers"""
+    key = _cache_key(current_user)
+    cached = user_cache.get(key)
+    if cached is not None:
+        _check_token_version(cached.token_version, current_user)
+        return cached
+
+    user = await load_user_async(db, current_user)
+    if not user:
+        return None
+    snapshot = CurrentUser.model_validate(user)
+    user_cache.set(key, snapshot)
+    return snapshot
+
 
 def get_current_active_user(
-    current_user: dict = Depends(get_current_user),
+    current_user: dict = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+) -> CurrentUser:
+    user = resolve_user(db, current_user)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+def get_current_user_row(
+    current_user: dict = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ) -> User:
-    user = db.query(User).filter(User.email == current_user["email"]).first()
+    """The authenticated user's row, for handlers that modify it"""
+    user = load_user(db, current_user)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+def require_admin(
+    current_user: dict = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+) -> dict:
+    """
+    التحقق من صلاحيات المشرف
+
+    Reads the user row on every call instead of the per-worker user cache,
+    so role and token version are current on all workers: a demoted admin
+    or a revoked token loses access immediately, not after the cache TTL.
+    """
+    user = load_user(db, current_user)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
\ No newline at end of file
+    if user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admins only"
+        )
+    return {**current_user, "id": user.id, "role": user.role, "token_version": user.token_version}
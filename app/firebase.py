@@ -1,10 +1,24 @@
 import firebase_admin
-from firebase_admin import credentials, messaging
+from firebase_admin import credentials, exceptions, messaging
 import os
 import logging
 
 logger = logging.getLogger(__name__)
 
+# FCM rejects multicast messages with more than 500 tokens
+FCM_BATCH_SIZE = 500
+
+# Errors meaning the token will never work again and should be forgotten
+DEAD_TOKEN_ERRORS = (messaging.UnregisteredError, messaging.SenderIdMismatchError)
+
+# Errors worth sending the batch again later (outage, timeout, quota)
+RETRYABLE_ERRORS = (
+    exceptions.UnavailableError,
+    exceptions.InternalError,
+    exceptions.DeadlineExceededError,
+    exceptions.ResourceExhaustedError,
+)
+
 # Initialize Firebase Admin SDK
 _firebase_app = None
 
@@ -27,37 +41,68 @@ def init_firebase():
     return _firebase_app
 
 
-def send_push_notification(tokens: list[str], title: str, body: str) -> dict:
-    """
-    Send a push notification to multiple device tokens.
-    
-    Returns a dict with 'success_count' and 'failure_count'.
-    """
-    if not tokens:
-        return {"success_count": 0, "failure_count": 0}
-    
+def _empty_result() -> dict:
+    return {"success_count": 0, "failure_count": 0, "invalid_tokens": []}
+
+
+def _firebase_ready() -> bool:
     if not _firebase_app:
         init_firebase()
-    
+
     if not _firebase_app:
         logger.warning("Firebase not initialized. Cannot send push notifications.")
-        return {"success_count": 0, "failure_count": 0}
-    
-    message = messaging.MulticastMessage(
+        return False
+    return True
+
+
+def _build_message(tokens: list[str], title: str, body: str) -> messaging.MulticastMessage:
+    return messaging.MulticastMessage(
         notification=messaging.Notification(
             title=title,
             body=body,
         ),
         tokens=tokens,
     )
-    
+
+
+def _batch_result(tokens: list[str], response) -> dict:
+    invalid_tokens = [
+        token
+        for token, result in zip(tokens, response.responses)
+        if not result.success and isinstance(result.exception, DEAD_TOKEN_ERRORS)
+    ]
+    return {
+        "success_count": response.success_count,
+        "failure_count": response.failure_count,
+        "invalid_tokens": invalid_tokens,
+    }
+
+
+def merge_results(results: list[dict]) -> dict:
+    """Add up per-batch results"""
+    merged = _empty_result()
+    for result in results:
+        merged["success_count"] += result["success_count"]
+        merged["failure_count"] += result["failure_count"]
+        merged["invalid_tokens"].extend(result["invalid_tokens"])
+    return merged
+
+
+async def send_push_batch_async(tokens: list[str], title: str, body: str) -> dict:
+    """
+    Send one batch of at most 500 tokens without blocking the event loop.
+
+    RETRYABLE_ERRORS are raised so the caller can send the batch again;
+    any other error counts the whole batch as failed.
+    """
+    if not tokens or not _firebase_ready():
+        return _empty_result()
+
     try:
-        response = messaging.send_each_for_multicast(message)
-        logger.info(f"FCM: {response.success_count} sent, {response.failure_count} failed")
-        return {
-            "success_count": response.success_count,
-            "failure_count": response.failure_count
-        }
+        response = await messaging.send_each_for_multicast_async(_build_message(tokens, title, body))
+        return _batch_result(tokens, response)
+    except RETRYABLE_ERRORS:
+        raise
     except Exception as e:
         logger.error(f"FCM send error: {e}")
-        return {"success_count": 0, "failure_count": 0}
+        return {"success_count": 0, "failure_count": len(tokens), "invalid_tokens": []}
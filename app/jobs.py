@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, insert, update, delete, or_, and_
+from .config import settings
+from .database import AsyncSessionLocal
+from .models import OutboundJob
+from .push import broadcast_push
+from .utils.email import mailer, send_verification_email, send_welcome_email, send_approval_email
+from .storage import delete_objects
+
+logger = logging.getLogger(__name__)
+
+# Job kind -> async callable taking the job payload as keyword arguments
+JOB_HANDLERS = {
+    "email.verification": send_verification_email,
+    "email.welcome": send_welcome_email,
+    "email.approval": send_approval_email,
+    "push.broadcast": broadcast_push,
+    "storage.delete": delete_objects,
+}
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue(db, kind: str, **payload) -> OutboundJob:
+    """
+    Add an outbound job to the session.
+
+    The job is saved by the caller's commit, together with the change that
+    caused it, so a message is never lost nor sent for a rolled back change.
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = OutboundJob(kind=kind, payload=payload)
+    db.add(job)
+    return job
+
+
+def enqueue_many(db, kind: str, payloads: list[dict]) -> None:
+    """Queue one job per payload with a single multi-row INSERT"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    if payloads:
+        db.execute(insert(OutboundJob), [{"kind": kind, "payload": payload} for payload in payloads])
+
+
+async def claim_jobs(db, limit: int, kinds: list[str] | None = None) -> list[OutboundJob]:
+    """Lock due jobs (and jobs abandoned by a dead worker) for this worker"""
+    now = _utcnow()
+    stale = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS)
+    statement = select(OutboundJob).where(or_(
+        and_(OutboundJob.status == "pending", OutboundJob.run_after <= now),
+        and_(OutboundJob.status == "running", OutboundJob.locked_at < stale),
+    ))
+    if kinds:
+        statement = statement.where(OutboundJob.kind.in_(kinds))
+    result = await db.execute(
+        statement
+        .order_by(OutboundJob.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    jobs = list(result.scalars().all())
+    for job in jobs:
+        job.status = "running"
+        job.locked_at = now
+        job.attempts += 1
+    await db.commit()
+    return jobs
+
+
+def _record_failure(job: OutboundJob, error: Exception) -> None:
+    job.last_error = f"{type(error).__name__}: {error}"
+    # Handlers that did part of the work say where the retry should resume
+    resume_payload = getattr(error, "resume_payload", None)
+    if resume_payload:
+        job.payload = {**job.payload, **resume_payload}
+    job.locked_at = None
+    if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+        job.status = "failed"
+        job.finished_at = _utcnow()
+        logger.error(f"Job {job.id} ({job.kind}) failed permanently: {job.last_error}")
+    else:
+        # Exponential backoff: base, 2x base, 4x base, ...
+        delay = settings.JOB_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1)
+        job.status = "pending"
+        job.run_after = _utcnow() + timedelta(seconds=delay)
+        logger.warning(f"Job {job.id} ({job.kind}) failed, retrying in {delay}s: {job.last_error}")
+
+
+async def _keep_locked(job_id: int) -> None:
+    """Refresh locked_at while a job runs, so a long job is not reclaimed as abandoned"""
+    while True:
+        await asyncio.sleep(settings.JOB_LOCK_TIMEOUT_SECONDS / 3)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(OutboundJob)
+                    .where(OutboundJob.id == job_id, OutboundJob.status == "running")
+                    .values(locked_at=_utcnow())
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Could not renew the lock on job {job_id}: {e}")
+
+
+async def run_job(job: OutboundJob) -> None:
+    handler = JOB_HANDLERS.get(job.kind)
+    heartbeat = asyncio.create_task(_keep_locked(job.id))
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        await handler(**job.payload)
+    except Exception as e:
+        _record_failure(job, e)
+    else:
+        job.status = "done"
+        job.locked_at = None
+        job.last_error = None
+        job.finished_at = _utcnow()
+    finally:
+        heartbeat.cancel()
+
+
+async def run_pending_jobs(limit: int | None = None, kinds: list[str] | None = None) -> int:
+    """Claim one batch of due jobs (optionally only of ``kinds``), run them concurrently and record outcomes"""
+    async with AsyncSessionLocal() as db:
+        jobs = await claim_jobs(db, limit or settings.JOB_BATCH_SIZE, kinds)
+        if not jobs:
+            return 0
+        await asyncio.gather(*(run_job(job) for job in jobs))
+        await db.commit()
+        return len(jobs)
+
+
+async def purge_finished_jobs() -> int:
+    """Delete done jobs finished more than JOB_RETENTION_DAYS ago (failed jobs stay for inspection)"""
+    cutoff = _utcnow() - timedelta(days=settings.JOB_RETENTION_DAYS)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            delete(OutboundJob)
+            .where(OutboundJob.status == "done", OutboundJob.finished_at < cutoff)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+    if result.rowcount:
+        logger.info(f"Deleted {result.rowcount} finished outbound jobs")
+    return result.rowcount
+
+
+async def run_worker(stop: asyncio.Event | None = None) -> None:
+    """Process outbound jobs until ``stop`` is set"""
+    stop = stop or asyncio.Event()
+    logger.info("Outbound job worker started")
+    next_cleanup = time.monotonic()
+    while not stop.is_set():
+        if time.monotonic() >= next_cleanup:
+            next_cleanup = time.monotonic() + settings.JOB_CLEANUP_INTERVAL_SECONDS
+            try:
+                await purge_finished_jobs()
+            except Exception as e:
+                logger.error(f"Job cleanup error: {e}")
+        try:
+            processed = await run_pending_jobs()
+        except Exception as e:
+            logger.error(f"Job worker error: {e}")
+            processed = 0
+        if not processed:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    await mailer.close()
+    logger.info("Outbound job worker stopped")
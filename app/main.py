@@ -1,11 +1,19 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine
+from .database import engine, get_pool_stats
 from . import models
 from .routers import users, auth, news, upload
 from .middleware import setup_rate_limiting, limiter
 from .config import settings
-from fastapi.staticfiles import StaticFiles
+from .pagination import NEXT_CURSOR_HEADER
+from .auth import get_password_hash_stats, benchmark_password_hash
+from .dependencies import require_admin
+from .jobs import run_worker
+from .utils.email import precompile_templates
+from .utils.images import shutdown_image_executor
+from contextlib import asynccontextmanager
+import asyncio
+from .static_files import CachedStaticFiles
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
@@ -14,8 +22,30 @@ models.Base.metadata.create_all(bind=engine)
 from .firebase import init_firebase
 init_firebase()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Report what the configured argon2 profile costs on this machine
+    if settings.ARGON2_BENCHMARK_ON_STARTUP:
+        await asyncio.to_thread(benchmark_password_hash)
+
+    # Email templates are compiled once, not on every send
+    precompile_templates()
+
+    # Outbound emails/pushes; several workers can share the queue safely
+    stop_worker = asyncio.Event()
+    worker = None
+    if settings.JOB_WORKER_IN_PROCESS:
+        worker = asyncio.create_task(run_worker(stop_worker))
+    yield
+    stop_worker.set()
+    if worker:
+        await worker
+    shutdown_image_executor()
+
+
 # Create FastAPI app
 app = FastAPI(
+    lifespan=lifespan,
     title=settings.APP_NAME,
     description="API شاملة لإدارة المستخدمين مع JWT Authentication",
     version="1.0.0",
@@ -24,7 +54,7 @@ app = FastAPI(
 )
 
 # Mount Static Files
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="app/static"), name="static")
 
 # Setup Rate Limiting
 setup_rate_limiting(app)
@@ -41,6 +71,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include routers
@@ -80,4 +111,16 @@ app.include_router(statistics.router)
 @limiter.limit("60/minute")
 def health_check(request: Request):
     """فحص حالة الخادم"""
-    return {"status": "healthy", "api": settings.APP_NAME}
\ No newline at end of file
+    return {"status": "healthy", "api": settings.APP_NAME}
+
+
+@app.get("/health/db", tags=["Health"])
+def database_pool_health(current_user: dict = Depends(require_admin)):
+    """إحصائيات مجمع اتصالات قاعدة البيانات (للمشرفين فقط)"""
+    return get_pool_stats()
+
+
+@app.get("/health/hashing", tags=["Health"])
+def password_hashing_health(current_user: dict = Depends(require_admin)):
+    """إحصائيات تشفير كلمات المرور (للمشرفين فقط)"""
+    return get_password_hash_stats()
@@ -1,10 +1,11 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Index, JSON
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .database import Base
 
 
 import uuid
+from datetime import datetime, timezone
 
 class User(Base):
     __tablename__ = "users"
@@ -28,11 +29,35 @@ class User(Base):
     status = Column(String, default="active", nullable=False)  # pending, active, rejected
     document_path = Column(String, nullable=True)  # Path to uploaded student ID document
     is_verified = Column(Boolean, default=False)
-    fcm_token = Column(String, nullable=True)  # Firebase Cloud Messaging device token
+    fcm_token = Column(String, nullable=True)  # Legacy single FCM token, superseded by device_tokens
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)  # Bumped to revoke issued tokens
     
     news = relationship("News", back_populates="author")
     notifications = relationship("Notification", back_populates="author", foreign_keys="[Notification.author_id]")
     received_notifications = relationship("Notification", back_populates="recipient", foreign_keys="[Notification.recipient_id]")
+    device_tokens = relationship("DeviceToken", back_populates="user", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Admin pending-registrations queue: filter on status, walk by (created_at, id)
+        Index("ix_users_status_created_at_id", "status", "created_at", "id"),
+    )
+
+
+class DeviceToken(Base):
+    __tablename__ = "device_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token = Column(String, unique=True, nullable=False)  # Firebase Cloud Messaging device token
+    platform = Column(String, nullable=True)  # android, ios or web
+    last_seen = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    user = relationship("User", back_populates="device_tokens")
+
+    __table_args__ = (
+        # Broadcast fan-out walks (id, token) in id order: an index-only scan
+        Index("ix_device_tokens_id_token", "id", "token"),
+    )
 
 
 class News(Base):
@@ -50,6 +75,10 @@ class News(Base):
     author = relationship("User", back_populates="news")
     images = relationship("NewsImage", back_populates="news", cascade="all, delete-orphan", order_by="NewsImage.order")
 
+    __table_args__ = (
+        Index("ix_news_created_at_id", "created_at", "id"),
+    )
+
 
 class NewsImage(Base):
     __tablename__ = "news_images"
@@ -76,6 +105,10 @@ class Notification(Base):
     recipient_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     recipient = relationship("User", back_populates="received_notifications", foreign_keys=[recipient_id])
 
+    __table_args__ = (
+        Index("ix_notifications_created_at_id", "created_at", "id"),
+    )
+
 
 class ExecutiveOffice(Base):
     __tablename__ = "executive_offices"
@@ -126,6 +159,10 @@ class Event(Base):
     
     registrations = relationship("EventRegistration", back_populates="event", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_events_date_id", "date", "id"),
+    )
+
 
 class EventRegistration(Base):
     __tablename__ = "event_registrations"
@@ -135,6 +172,31 @@ class EventRegistration(Base):
     event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
     registered_at = Column(DateTime(timezone=True), server_default=func.now())
     attended = Column(Boolean, default=False)
+    attended_at = Column(DateTime(timezone=True), nullable=True)  # Scan time, may come from an offline scanner
     
     user = relationship("User")
-    event = relationship("Event", back_populates="registrations")
\ No newline at end of file
+    event = relationship("Event", back_populates="registrations")
+
+    __table_args__ = (
+        # One registration per user per event; also serves check-in lookups
+        Index("uq_event_registrations_event_user", "event_id", "user_id", unique=True),
+    )
+
+
+class OutboundJob(Base):
+    __tablename__ = "outbound_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # e.g. email.verification, push.broadcast
+    payload = Column(JSON, nullable=False, default=dict)
+    status = Column(String, default="pending", nullable=False)  # pending, running, done, failed
+    attempts = Column(Integer, default=0, nullable=False)
+    run_after = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_outbound_jobs_status_run_after", "status", "run_after"),
+    )
@@ -0,0 +1,145 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, Response, status
+from sqlalchemy import Select, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+SQLITE_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%f"
+
+
+def encode_cursor(values: list) -> str:
+    """تحويل قيم آخر صف إلى cursor نصي"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: list) -> list:
+    """استخراج قيم الـ cursor حسب أعمدة الترتيب"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise ValueError("cursor length mismatch")
+
+        return [_coerce(column, value) for column, value in zip(columns, payload)]
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def _python_type(column):
+    try:
+        return column.type.python_type
+    except NotImplementedError:
+        return None
+
+
+def _coerce(column, value):
+    """Cursor value as the column's Python type; a wrong type is rejected, not sent to the database"""
+    python_type = _python_type(column)
+    if python_type is None:
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is int and isinstance(value, str):
+        return int(value)
+    if not isinstance(value, python_type) or (python_type is not bool and isinstance(value, bool)):
+        raise TypeError(f"expected {python_type.__name__}")
+    return value
+
+
+def _sort_expressions(columns: list, dialect: str | None) -> list:
+    """
+    Expressions to order and compare on.
+
+    SQLite stores datetimes as text, and rows filled by ``server_default=func.now()``
+    lack the fractional seconds a bound Python datetime carries, so the raw
+    values compare wrongly as strings. There both sides are normalised to one
+    format (millisecond precision; the id column breaks ties).
+    """
+    if dialect != "sqlite":
+        return list(columns)
+    return [
+        func.strftime(SQLITE_DATETIME_FORMAT, c) if _python_type(c) is datetime else c
+        for c in columns
+    ]
+
+
+def _keyset_statement(statement, columns: list, cursor: str | None, skip: int, limit: int, descending: bool, dialect: str | None = None):
+    """Apply cursor/offset filtering and ordering to a Query or select()"""
+    keys = _sort_expressions(columns, dialect)
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        if dialect == "sqlite":
+            values = [func.strftime(SQLITE_DATETIME_FORMAT, v) if isinstance(v, datetime) else v for v in values]
+        if descending:
+            statement = statement.filter(tuple_(*keys) < tuple_(*values))
+        else:
+            statement = statement.filter(tuple_(*keys) > tuple_(*values))
+
+    order_by = [k.desc() if descending else k.asc() for k in keys]
+    statement = statement.order_by(*order_by)
+    if skip and not cursor:
+        statement = statement.offset(skip)
+    # One extra row tells us whether another page exists
+    return statement.limit(max(limit, 0) + 1)
+
+
+def _page(rows: list, columns: list, response: Response, limit: int) -> list:
+    limit = max(limit, 0)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if rows:
+            last = rows[-1]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor([getattr(last, c.key) for c in columns])
+    return rows
+
+
+def paginate(
+    query: Query,
+    columns: list,
+    response: Response,
+    cursor: str | None = None,
+    skip: int = 0,
+    limit: int = 100,
+    descending: bool = True,
+) -> list:
+    """
+    Keyset pagination over ``columns`` (the last one must be unique, e.g. id).
+
+    With ``cursor`` the page starts right after the row it encodes, so the
+    database seeks through the matching composite index instead of walking
+    the skipped rows. Without it, ``skip`` keeps working for older clients.
+    The cursor for the following page is returned in the X-Next-Cursor header.
+    """
+    dialect = query.session.get_bind().dialect.name
+    rows = _keyset_statement(query, columns, cursor, skip, limit, descending, dialect).all()
+    return _page(rows, columns, response, limit)
+
+
+async def paginate_async(
+    db: AsyncSession,
+    statement: Select,
+    columns: list,
+    response: Response,
+    cursor: str | None = None,
+    skip: int = 0,
+    limit: int = 100,
+    descending: bool = True,
+    scalars: bool = True,
+) -> list:
+    """
+    Same as ``paginate`` for a ``select()`` run on an AsyncSession.
+
+    Pass ``scalars=False`` for column projections so rows are returned as-is.
+    """
+    dialect = db.get_bind().dialect.name
+    result = await db.execute(_keyset_statement(statement, columns, cursor, skip, limit, descending, dialect))
+    rows = result.scalars().all() if scalars else result.all()
+    return _page(list(rows), columns, response, limit)
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from sqlalchemy import select, delete
+from .config import settings
+from .database import AsyncSessionLocal
+from .firebase import FCM_BATCH_SIZE, RETRYABLE_ERRORS, send_push_batch_async, merge_results
+from .models import DeviceToken
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastInterrupted(Exception):
+    """
+    A batch failed with a retryable FCM error.
+
+    ``resume_payload`` holds the token id every earlier batch was sent up
+    to; the job queue merges it into the job payload so the retry starts
+    there instead of notifying the same devices again.
+    """
+
+    def __init__(self, error: Exception, after_id: int):
+        super().__init__(f"{type(error).__name__}: {error}")
+        self.resume_payload = {"after_id": after_id}
+
+
+async def _token_batches(db, batch_size: int, after_id: int = 0):
+    """Stream registered device tokens in id order, one batch at a time, with the batch's last id"""
+    last_id = after_id
+    while True:
+        result = await db.execute(
+            select(DeviceToken.id, DeviceToken.token)
+            .where(DeviceToken.id > last_id)
+            .order_by(DeviceToken.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield last_id, [row.token for row in rows]
+
+
+async def prune_tokens(db, tokens: list[str]) -> None:
+    """Forget tokens FCM reported as unregistered"""
+    if not tokens:
+        return
+    await db.execute(
+        delete(DeviceToken)
+        .where(DeviceToken.token.in_(tokens))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def broadcast_push(title: str, body: str, after_id: int = 0, batch_size: int = FCM_BATCH_SIZE) -> dict:
+    """
+    Send a push notification to every registered device after ``after_id``.
+
+    Tokens are read from the database in batches of at most 500 (the FCM
+    multicast limit) and up to FCM_MAX_PARALLEL_BATCHES batches are in
+    flight at once, so memory stays flat however many devices there are.
+    A retryable FCM error stops reading new batches and raises
+    BroadcastInterrupted once the in-flight ones finish.
+    """
+    batch_size = min(batch_size, FCM_BATCH_SIZE)
+    limiter = asyncio.Semaphore(settings.FCM_MAX_PARALLEL_BATCHES)
+    interrupted = asyncio.Event()
+
+    async def send(tokens: list[str]) -> dict:
+        try:
+            return await send_push_batch_async(tokens, title, body)
+        except RETRYABLE_ERRORS:
+            interrupted.set()
+            raise
+        finally:
+            limiter.release()
+
+    async with AsyncSessionLocal() as db:
+        last_ids, tasks = [], []
+        async for last_id, tokens in _token_batches(db, batch_size, after_id):
+            # Wait for a free slot before reading the next batch
+            await limiter.acquire()
+            if interrupted.is_set():
+                limiter.release()
+                break
+            last_ids.append(last_id)
+            tasks.append(asyncio.create_task(send(tokens)))
+
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        results = [outcome for outcome in outcomes if not isinstance(outcome, BaseException)]
+        result = merge_results(results)
+        await prune_tokens(db, result["invalid_tokens"])
+
+    for last_id, outcome in zip(last_ids, outcomes):
+        if isinstance(outcome, BaseException):
+            logger.warning(f"Broadcast push interrupted after token id {after_id}: {outcome}")
+            raise BroadcastInterrupted(outcome, after_id)
+        after_id = last_id
+
+    logger.info(
+        f"Broadcast push: {result['success_count']} sent, {result['failure_count']} failed, "
+        f"{len(result['invalid_tokens'])} tokens pruned"
+    )
+    return result
@@ -1,49 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select, insert, update, delete
 from sqlalchemy.orm import Session
 from ..database import get_db
-from ..models import User, Notification
-from ..auth import require_admin, get_current_user
-import os
+from ..models import User, Notification, DeviceToken
+from .. import schemas
+from ..auth import get_current_user
+from ..dependencies import resolve_user, require_admin
+from ..cache import invalidate_user
+from ..jobs import enqueue, enqueue_many
+from ..pagination import paginate
+from ..storage import get_storage, storage_key
+from datetime import datetime
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
 
-@router.get("/pending-registrations")
+# Only the columns the admin queue shows; never the password hash
+PENDING_COLUMNS = (
+    User.id, User.name, User.email, User.university, User.specialization,
+    User.degree, User.academic_year, User.profile_image, User.document_path, User.created_at,
+)
+
+
+def _document_url(document_path: str | None) -> str | None:
+    if not document_path:
+        return None
+    # Presigned (time-limited) on S3, the static URL on local storage
+    return get_storage().download_url(storage_key(document_path))
+
+
+@router.get("/pending-registrations", response_model=list[schemas.PendingUserOut])
 def get_pending_registrations(
+    response: Response,
+    university: str | None = None,
+    degree: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = None,
     db: Session = Depends(get_db),
     current_user: dict = Depends(require_admin),
 ):
-    """الحصول على قائمة التسجيلات المعلقة"""
-    pending_users = db.query(User).filter(User.status == "pending").all()
-
-    result = []
-    for user in pending_users:
-        document_url = None
-        if user.document_path:
-            # Convert file path to URL
-            filename = os.path.basename(user.document_path)
-            document_url = f"https://api.sdotist.org/static/documents/{filename}"
-
-        result.append({
-            "id": user.id,
-            "name": user.name,
-            "email": user.email,
-            "university": user.university,
-            "specialization": user.specialization,
-            "degree": user.degree,
-            "academic_year": user.academic_year,
-            "profile_image": user.profile_image,
-            "document_url": document_url,
-            "created_at": user.created_at.isoformat() if user.created_at else None,
-        })
-
-    return result
+    """الحصول على قائمة التسجيلات المعلقة (الأقدم أولاً)"""
+    query = db.query(*PENDING_COLUMNS).filter(User.status == "pending")
+    if university:
+        query = query.filter(User.university == university)
+    if degree:
+        query = query.filter(User.degree == degree)
+    if created_from:
+        query = query.filter(User.created_at >= created_from)
+    if created_to:
+        query = query.filter(User.created_at < created_to)
+
+    rows = paginate(query, [User.created_at, User.id], response, cursor, skip, limit, descending=False)
+    return [
+        schemas.PendingUserOut(**row._mapping, document_url=_document_url(row.document_path))
+        for row in rows
+    ]
 
 
 @router.post("/registrations/{user_id}/approve")
 async def approve_registration(
     user_id: int,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: dict = Depends(require_admin),
 ):
@@ -61,16 +80,16 @@ async def approve_registration(
             detail="User is not in pending status"
         )
 
-    # Delete document from disk
-    if user.document_path and os.path.exists(user.document_path):
-        os.remove(user.document_path)
+    # Delete the document after the response, from whichever storage holds it
+    if user.document_path:
+        enqueue(db, "storage.delete", keys=[user.document_path])
 
     # Update user status
     user.status = "active"
     user.document_path = None
 
     # Create notification for the user
-    admin_user = db.query(User).filter(User.email == current_user["email"]).first()
+    admin_user = resolve_user(db, current_user)
     notification = Notification(
         title="Account Activated / تم تفعيل حسابك",
         body="Your account has been activated. You can now login. / تم تفعيل حسابك. يمكنك الآن تسجيل الدخول.",
@@ -78,11 +97,11 @@ async def approve_registration(
         recipient_id=user.id
     )
     db.add(notification)
-    db.commit()
 
-    # Send approval email in background AFTER response is returned
-    from ..utils.email import send_approval_email
-    background_tasks.add_task(send_approval_email, user.email, user.name)
+    # Queue approval email
+    enqueue(db, "email.approval", email=user.email, name=user.name)
+    db.commit()
+    invalidate_user(user.id, user.email)
 
     return {"message": "User approved successfully", "user_id": user_id}
 
@@ -107,12 +126,141 @@ def reject_registration(
             detail="User is not in pending status"
         )
 
-    # Delete document from disk
-    if user.document_path and os.path.exists(user.document_path):
-        os.remove(user.document_path)
+    # Delete the document after the response, from whichever storage holds it
+    if user.document_path:
+        enqueue(db, "storage.delete", keys=[user.document_path])
 
     # Delete user from database
     db.delete(user)
     db.commit()
+    invalidate_user(user.id, user.email)
 
     return {"message": "User rejected and deleted", "user_id": user_id}
+
+
+def _pending_registrations(db: Session, user_ids: list[int]) -> tuple[dict, dict]:
+    """Load the requested users in one query and sort out the ones that cannot be processed"""
+    rows = db.execute(
+        select(User.id, User.name, User.email, User.status, User.document_path)
+        .where(User.id.in_(user_ids))
+    ).all()
+    found = {row.id: row for row in rows}
+
+    results = {}
+    pending = {}
+    for user_id in dict.fromkeys(user_ids):
+        row = found.get(user_id)
+        if row is None:
+            results[user_id] = "not_found"
+        elif row.status != "pending":
+            results[user_id] = "not_pending"
+        else:
+            pending[user_id] = row
+    return pending, results
+
+
+def _bulk_response(user_ids: list[int], results: dict, done: str) -> dict:
+    return {
+        done: sum(1 for value in results.values() if value == done),
+        "results": [
+            schemas.RegistrationBulkResult(user_id=user_id, status=results[user_id])
+            for user_id in dict.fromkeys(user_ids)
+        ],
+    }
+
+
+@router.post("/registrations/approve")
+def bulk_approve_registrations(
+    data: schemas.RegistrationBulkAction,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(require_admin),
+):
+    """قبول عدة تسجيلات دفعة واحدة"""
+    pending, results = _pending_registrations(db, data.user_ids)
+
+    approved_ids = []
+    if pending:
+        # The status guard skips users another admin processed in the meantime
+        approved_ids = db.execute(
+            update(User)
+            .where(User.id.in_(pending), User.status == "pending")
+            .values(status="active", document_path=None)
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+
+    approved = [pending[user_id] for user_id in approved_ids]
+    for user_id in pending:
+        results[user_id] = "not_pending"
+    for row in approved:
+        results[row.id] = "approved"
+
+    if approved:
+        admin_user = resolve_user(db, current_user)
+        db.execute(insert(Notification), [
+            {
+                "title": "Account Activated / تم تفعيل حسابك",
+                "body": "Your account has been activated. You can now login. / تم تفعيل حسابك. يمكنك الآن تسجيل الدخول.",
+                "author_id": admin_user.id if admin_user else None,
+                "recipient_id": row.id,
+            }
+            for row in approved
+        ])
+        enqueue_many(db, "email.approval", [{"email": row.email, "name": row.name} for row in approved])
+
+        documents = [row.document_path for row in approved if row.document_path]
+        if documents:
+            enqueue(db, "storage.delete", keys=documents)
+
+        db.commit()
+        for row in approved:
+            invalidate_user(row.id, row.email)
+
+    return _bulk_response(data.user_ids, results, "approved")
+
+
+@router.post("/registrations/reject")
+def bulk_reject_registrations(
+    data: schemas.RegistrationBulkAction,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(require_admin),
+):
+    """رفض عدة تسجيلات وحذفها دفعة واحدة"""
+    pending, results = _pending_registrations(db, data.user_ids)
+
+    rejected = []
+    if pending:
+        still_pending = select(User.id).where(User.id.in_(pending), User.status == "pending")
+        # Same clean-up the ORM cascade does for a single delete
+        db.execute(
+            update(Notification)
+            .where(Notification.recipient_id.in_(still_pending))
+            .values(recipient_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            delete(DeviceToken)
+            .where(DeviceToken.user_id.in_(still_pending))
+            .execution_options(synchronize_session=False)
+        )
+        rejected_ids = db.execute(
+            delete(User)
+            .where(User.id.in_(pending), User.status == "pending")
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        rejected = [pending[user_id] for user_id in rejected_ids]
+
+    for user_id in pending:
+        results[user_id] = "not_pending"
+    for row in rejected:
+        results[row.id] = "rejected"
+
+    documents = [row.document_path for row in rejected if row.document_path]
+    if documents:
+        enqueue(db, "storage.delete", keys=documents)
+    db.commit()
+    for row in rejected:
+        invalidate_user(row.id, row.email)
+
+    return _bulk_response(data.user_ids, results, "rejected")
@@ -1,28 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Body, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from ..database import SessionLocal
+from ..database import get_db
 from ..models import User
 from ..auth import (
-    verify_password,
+    verify_and_update_password,
     create_access_token,
     create_refresh_token,
-    verify_token
+    verify_token,
+    token_claims
 )
 from ..schemas import Token
 from ..middleware import limiter
+from ..dependencies import load_user
+from ..jobs import enqueue
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.post("/login", response_model=Token)
 @limiter.limit("60/minute")
 def login(
@@ -33,12 +28,18 @@ def login(
     """تسجيل الدخول والحصول على Tokens"""
     user = db.query(User).filter(User.email == form_data.username).first()
 
-    if not user or not verify_password(form_data.password, user.password):
+    valid, new_hash = verify_and_update_password(form_data.password, user.password) if user else (False, None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="بيانات الدخول غير صحيحة"
         )
 
+    # Stored hash uses an older argon2 profile: replace it while we have the password
+    if new_hash:
+        user.password = new_hash
+        db.commit()
+
     # Check verification status
     if not user.is_verified:
         raise HTTPException(
@@ -58,7 +59,7 @@ def login(
             detail="تم رفض حسابك / Your account has been rejected"
         )
 
-    token_data = {"sub": user.email, "role": user.role}
+    token_data = token_claims(user)
 
     return {
         "access_token": create_access_token(token_data),
@@ -68,12 +69,14 @@ def login(
 
 
 @router.post("/refresh", response_model=Token)
-def refresh_token(refresh_token: str = Body(..., embed=True)):
+def refresh_token(
+    refresh_token: str = Body(..., embed=True),
+    db: Session = Depends(get_db)
+):
     """تجديد Access Token باستخدام Refresh Token"""
     payload = verify_token(refresh_token, "refresh")
 
     email = payload.get("sub")
-    role = payload.get("role")
 
     if not email:
         raise HTTPException(
@@ -81,7 +84,15 @@ def refresh_token(refresh_token: str = Body(..., embed=True)):
             detail="Invalid refresh token"
         )
 
-    token_data = {"sub": email, "role": role}
+    # Legacy email-only refresh tokens are upgraded to id-carrying ones here
+    user = load_user(db, {"email": email, "id": payload.get("uid"), "token_version": payload.get("ver")})
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token"
+        )
+
+    token_data = token_claims(user)
 
     return {
         "access_token": create_access_token(token_data),
@@ -106,16 +117,13 @@ async def verify_email(token: str, db: Session = Depends(get_db)):
              
         if not user.is_verified:
             user.is_verified = True
+            # Queue welcome email
+            enqueue(db, "email.welcome", email=user.email, name=user.name)
             db.commit()
-            
-            # Send Welcome Email
-            from ..utils.email import send_welcome_email
-            import asyncio
-            asyncio.create_task(send_welcome_email(user.email, user.name))
         
         from fastapi.responses import HTMLResponse
-        from ..utils.email import conf
-        return HTMLResponse(content=open(f"{conf.TEMPLATE_FOLDER}/verification_success.html").read())
+        from ..utils.email import static_page
+        return HTMLResponse(content=static_page("verification_success.html"))
         
     except Exception as e:
         raise HTTPException(status_code=400, detail="Invalid verification link or expired")
\ No newline at end of file
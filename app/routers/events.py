@@ -1,19 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import base64
+import hashlib
+import json
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, selectinload, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select, update, func, case, and_, or_
 from typing import List
 from .. import models, schemas, database, auth, dependencies
-from datetime import datetime
+from ..pagination import paginate_async
+from ..utils import manifests
+from datetime import datetime, timezone
 
 router = APIRouter(
     prefix="/events",
     tags=["Events"]
 )
 
+# EventOut embeds registrations -> user, so every query that returns full
+# events must load both levels up front instead of lazily per row.
+# Lists use selectin (one extra IN query per level, no row explosion);
+# single events use joined loading (one round trip).
+EVENT_LIST_LOAD = selectinload(models.Event.registrations).selectinload(models.EventRegistration.user)
+EVENT_DETAIL_LOAD = joinedload(models.Event.registrations).joinedload(models.EventRegistration.user)
+
+
+def _get_event_with_registrations(db: Session, event_id: int):
+    return (
+        db.query(models.Event)
+        .options(EVENT_DETAIL_LOAD)
+        .filter(models.Event.id == event_id)
+        .first()
+    )
+
 @router.post("/", response_model=schemas.EventOut)
 def create_event(
     event: schemas.EventCreate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(dependencies.get_current_active_user)
+    current_user: schemas.UserOut = Depends(dependencies.get_current_active_user)
 ):
     """
     إنشاء فعالية جديدة (للمسؤولين فقط)
@@ -31,26 +56,72 @@ def create_event(
     return new_event
 
 @router.get("/", response_model=List[schemas.EventOut])
-def get_events(
+async def get_events(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(database.get_db)
+    cursor: str | None = None,
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """
     الحصول على قائمة الفعاليات
     """
-    events = db.query(models.Event).order_by(models.Event.date.desc()).offset(skip).limit(limit).all()
-    return events
+    statement = select(models.Event).options(EVENT_LIST_LOAD)
+    return await paginate_async(db, statement, [models.Event.date, models.Event.id], response, cursor, skip, limit)
+
+@router.get("/summary", response_model=List[schemas.EventSummaryOut])
+async def get_events_summary(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """
+    الحصول على قائمة مختصرة للفعاليات مع عدد المسجلين والحضور
+    """
+    counts = (
+        select(
+            models.EventRegistration.event_id,
+            func.count(models.EventRegistration.id).label("registration_count"),
+            func.sum(case((models.EventRegistration.attended == True, 1), else_=0)).label("attended_count"),
+        )
+        .group_by(models.EventRegistration.event_id)
+        .subquery()
+    )
+
+    statement = (
+        select(
+            models.Event.id,
+            models.Event.title,
+            models.Event.date,
+            models.Event.location,
+            models.Event.image_url,
+            models.Event.is_ended,
+            func.coalesce(counts.c.registration_count, 0).label("registration_count"),
+            func.coalesce(counts.c.attended_count, 0).label("attended_count"),
+        )
+        .outerjoin(counts, counts.c.event_id == models.Event.id)
+    )
+    return await paginate_async(
+        db, statement, [models.Event.date, models.Event.id],
+        response, cursor, skip, limit, scalars=False
+    )
 
 @router.get("/{event_id}", response_model=schemas.EventOut)
-def get_event(
+async def get_event(
     event_id: int,
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """
     الحصول على تفاصيل فعالية معينة
     """
-    event = db.query(models.Event).filter(models.Event.id == event_id).first()
+    result = await db.execute(
+        select(models.Event)
+        .options(EVENT_DETAIL_LOAD)
+        .where(models.Event.id == event_id)
+    )
+    event = result.unique().scalar_one_or_none()
     if not event:
         raise HTTPException(status_code=404, detail="الفعالية غير موجودة")
     return event
@@ -59,7 +130,7 @@ def get_event(
 def register_for_event(
     event_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(dependencies.get_current_active_user)
+    current_user: schemas.UserOut = Depends(dependencies.get_current_active_user)
 ):
     """
     تسجيل المستخدم في فعالية
@@ -85,7 +156,12 @@ def register_for_event(
         event_id=event_id
     )
     db.add(new_registration)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent request for the same registration
+        db.rollback()
+        raise HTTPException(status_code=400, detail="أنت مسجل بالفعل في هذه الفعالية")
     db.refresh(new_registration)
     return new_registration
 
@@ -93,7 +169,7 @@ def register_for_event(
 def unregister_from_event(
     event_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(dependencies.get_current_active_user)
+    current_user: schemas.UserOut = Depends(dependencies.get_current_active_user)
 ):
     """
     إلغاء تسجيل المستخدم في فعالية
@@ -121,7 +197,7 @@ def unregister_from_event(
 def get_event_registrations(
     event_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(dependencies.get_current_active_user)
+    current_user: schemas.UserOut = Depends(dependencies.get_current_active_user)
 ):
     """
     الحصول على قائمة المسجلين في فعالية (للمسؤولين فقط)
@@ -135,15 +211,20 @@ def get_event_registrations(
     event = db.query(models.Event).filter(models.Event.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="الفعالية غير موجودة")
-        
-    return event.registrations
+
+    return (
+        db.query(models.EventRegistration)
+        .options(joinedload(models.EventRegistration.user))
+        .filter(models.EventRegistration.event_id == event_id)
+        .all()
+    )
 
 @router.post("/{event_id}/verify", response_model=schemas.EventRegistrationOut)
 def verify_attendance(
     event_id: int,
     barcode_id: str,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(dependencies.get_current_active_user)
+    current_user: schemas.UserOut = Depends(dependencies.get_current_active_user)
 ):
     """
     تحقق من حضور المستخدم عبر الباركود (للمسؤولين فقط)
@@ -172,17 +253,214 @@ def verify_attendance(
          raise HTTPException(status_code=400, detail="تم التحقق من الحضور مسبقاً")
 
     registration.attended = True
+    registration.attended_at = datetime.now(timezone.utc)
     db.commit()
     db.refresh(registration)
     return registration
 
 
+@router.post("/{event_id}/check-in", response_model=schemas.CheckInBatchOut)
+def check_in_batch(
+    event_id: int,
+    batch: schemas.CheckInBatch,
+    db: Session = Depends(database.get_db),
+    current_user: schemas.UserOut = Depends(dependencies.get_current_active_user)
+):
+    """
+    تسجيل حضور عدة باركودات دفعة واحدة، بما فيها المسح دون اتصال (للمسؤولين فقط)
+    """
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="ليس لديك صلاحية للتحقق من الحضور"
+        )
+    if db.get(models.Event, event_id) is None:
+        raise HTTPException(status_code=404, detail="الفعالية غير موجودة")
+
+    now = datetime.now(timezone.utc)
+    # Earliest scan of each barcode wins; scanner clocks ahead of ours are clamped
+    scans = {}
+    for scan in sorted(batch.scans, key=lambda s: _scan_time(s, now)):
+        scans.setdefault(scan.barcode_id, _scan_time(scan, now))
+
+    # Users and their registration for this event in one round trip
+    rows = db.execute(
+        select(
+            models.User.barcode_id,
+            models.User.id.label("user_id"),
+            models.User.name,
+            models.EventRegistration.id.label("registration_id"),
+            models.EventRegistration.attended,
+            models.EventRegistration.attended_at,
+        )
+        .outerjoin(
+            models.EventRegistration,
+            and_(
+                models.EventRegistration.user_id == models.User.id,
+                models.EventRegistration.event_id == event_id,
+            ),
+        )
+        .where(models.User.barcode_id.in_(scans))
+    ).all()
+    found = {row.barcode_id: row for row in rows}
+
+    to_mark = {
+        row.registration_id: scans[barcode]
+        for barcode, row in found.items()
+        if row.registration_id is not None and not row.attended
+    }
+    marked = set()
+    if to_mark:
+        # attended is re-checked so a concurrent scan of the same person is not counted twice
+        marked = set(db.execute(
+            update(models.EventRegistration)
+            .where(
+                models.EventRegistration.id.in_(to_mark),
+                or_(models.EventRegistration.attended.is_(False), models.EventRegistration.attended.is_(None)),
+            )
+            .values(
+                attended=True,
+                attended_at=case(to_mark, value=models.EventRegistration.id),
+            )
+            .returning(models.EventRegistration.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all())
+        db.commit()
+
+    results = []
+    seen = set()
+    for scan in batch.scans:
+        barcode = scan.barcode_id
+        row = found.get(barcode)
+        if barcode in seen:
+            results.append(schemas.CheckInResult(barcode_id=barcode, status="duplicate"))
+            continue
+        seen.add(barcode)
+        if row is None:
+            results.append(schemas.CheckInResult(barcode_id=barcode, status="unknown_barcode"))
+            continue
+        result = schemas.CheckInResult(barcode_id=barcode, status="not_registered", user_id=row.user_id, name=row.name)
+        if row.registration_id is not None:
+            result.registration_id = row.registration_id
+            if row.registration_id in marked:
+                result.status = "checked_in"
+                result.attended_at = scans[barcode]
+            else:
+                result.status = "already_checked_in"
+                result.attended_at = row.attended_at
+        results.append(result)
+
+    return schemas.CheckInBatchOut(checked_in=len(marked), results=results)
+
+
+@router.get("/check-in/public-key")
+def get_check_in_public_key():
+    """
+    المفتاح العام للتحقق من قوائم الحضور الموقعة
+
+    Only the private key can sign manifests, so publishing this lets scanner
+    devices verify them without being able to forge one.
+    """
+    return {
+        "algorithm": manifests.SIGNATURE_ALGORITHM,
+        "key_id": manifests.key_id(),
+        "public_key": base64.b64encode(manifests.public_key_bytes()).decode(),
+    }
+
+
+@router.get("/{event_id}/check-in/manifest")
+def get_check_in_manifest(
+    event_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: schemas.UserOut = Depends(dependencies.get_current_active_user)
+):
+    """
+    قائمة موقعة بتسجيلات الفعالية لأجهزة المسح دون اتصال (للمسؤولين فقط)
+
+    NDJSON: a header line, one line per registration
+    (``{"h": barcode hash, "r": registration id, "n": name, "a": attended}``)
+    and a final line with the count and an Ed25519 signature of the SHA-256
+    of every byte before it, verifiable with /events/check-in/public-key.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="ليس لديك صلاحية للتحقق من الحضور"
+        )
+    if db.get(models.Event, event_id) is None:
+        raise HTTPException(status_code=404, detail="الفعالية غير موجودة")
+
+    return StreamingResponse(
+        _manifest_lines(event_id),
+        media_type="application/x-ndjson",
+        headers={
+            "Cache-Control": "no-store",
+            "Content-Disposition": f'attachment; filename="event-{event_id}-manifest.ndjson"',
+        },
+    )
+
+
+def _manifest_lines(event_id: int):
+    digest = hashlib.sha256()
+
+    def line(obj) -> bytes:
+        data = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+        digest.update(data)
+        return data
+
+    yield line({
+        "event_id": event_id,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "barcode_hash": "sha256(<event_id>:<barcode_id>)",
+        "key_id": manifests.key_id(),
+    })
+
+    # Own session: the response body outlives the request's dependencies.
+    # Rows are streamed from a server-side cursor rather than loaded at once.
+    count = 0
+    with database.SessionLocal() as db:
+        rows = db.execute(
+            select(
+                models.User.barcode_id,
+                models.User.name,
+                models.EventRegistration.id,
+                models.EventRegistration.attended,
+            )
+            .join(models.User, models.EventRegistration.user_id == models.User.id)
+            .where(models.EventRegistration.event_id == event_id, models.User.barcode_id.is_not(None))
+            .order_by(models.EventRegistration.id)
+            .execution_options(yield_per=500)
+        )
+        for barcode_id, name, registration_id, attended in rows:
+            count += 1
+            yield line({
+                "h": manifests.barcode_hash(event_id, barcode_id),
+                "r": registration_id,
+                "n": name,
+                "a": bool(attended),
+            })
+
+    trailer = {
+        "count": count,
+        "algorithm": manifests.SIGNATURE_ALGORITHM,
+        "signature": manifests.sign_digest(digest.digest()),
+    }
+    yield json.dumps(trailer, separators=(",", ":")).encode() + b"\n"
+
+
+def _scan_time(scan: schemas.CheckInScan, now: datetime) -> datetime:
+    if scan.scanned_at is None:
+        return now
+    scanned_at = scan.scanned_at if scan.scanned_at.tzinfo else scan.scanned_at.replace(tzinfo=timezone.utc)
+    return min(scanned_at, now)
+
+
 @router.put("/{event_id}", response_model=schemas.EventOut)
 def update_event(
     event_id: int,
     event_update: schemas.EventUpdate,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(dependencies.get_current_active_user)
+    current_user: schemas.UserOut = Depends(dependencies.get_current_active_user)
 ):
     """
     تحديث بيانات فعالية (للمسؤولين فقط)
@@ -202,15 +480,14 @@ def update_event(
         setattr(event, key, value)
     
     db.commit()
-    db.refresh(event)
-    return event
+    return _get_event_with_registrations(db, event_id)
 
 
 @router.delete("/{event_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_event(
     event_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(dependencies.get_current_active_user)
+    current_user: schemas.UserOut = Depends(dependencies.get_current_active_user)
 ):
     """
     حذف فعالية (للمسؤولين فقط)
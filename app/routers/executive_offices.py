@@ -1,23 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.orm import Session
-from ..database import SessionLocal
+from ..database import get_db
 from ..models import ExecutiveOffice, OfficeMember
 from ..schemas import ExecutiveOfficeCreate, ExecutiveOfficeUpdate, ExecutiveOfficeOut, OfficeMemberCreate, OfficeMemberUpdate, OfficeMemberOut
-from ..auth import require_admin, get_current_user
+from ..auth import get_current_user
+from ..dependencies import require_admin
+from ..pagination import paginate
 
 router = APIRouter(prefix="/offices", tags=["Executive Offices"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/", response_model=list[ExecutiveOfficeOut])
-def get_offices(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_offices(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    db: Session = Depends(get_db)
+):
     """List all executive offices"""
-    return db.query(ExecutiveOffice).offset(skip).limit(limit).all()
+    return paginate(db.query(ExecutiveOffice), [ExecutiveOffice.id], response, cursor, skip, limit, descending=False)
 
 @router.get("/{office_id}", response_model=ExecutiveOfficeOut)
 def get_office(office_id: int, db: Session = Depends(get_db)):
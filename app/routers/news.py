@@ -1,31 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from ..database import SessionLocal
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_db, get_async_db
 from ..models import News, NewsImage, User
 from ..schemas import NewsCreate, NewsUpdate, NewsOut
-from ..auth import get_current_user, require_admin
+from ..auth import get_current_user
+from ..pagination import paginate_async
+from ..dependencies import resolve_user, require_admin
 
 router = APIRouter(prefix="/news", tags=["News"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.get("/", response_model=list[NewsOut])
-def get_all_news(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_all_news(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db)
+):
     """الحصول على جميع الأخبار (عام)"""
-    return db.query(News).order_by(News.created_at.desc()).offset(skip).limit(limit).all()
+    statement = select(News).options(selectinload(News.images))
+    return await paginate_async(db, statement, [News.created_at, News.id], response, cursor, skip, limit)
 
 
 @router.get("/{news_id}", response_model=NewsOut)
-def get_news(news_id: int, db: Session = Depends(get_db)):
+async def get_news(news_id: int, db: AsyncSession = Depends(get_async_db)):
     """الحصول على خبر محدد (عام)"""
-    news = db.query(News).filter(News.id == news_id).first()
+    result = await db.execute(
+        select(News).options(selectinload(News.images)).where(News.id == news_id)
+    )
+    news = result.scalar_one_or_none()
     if not news:
         raise HTTPException(status_code=404, detail="News not found")
     return news
@@ -38,7 +44,7 @@ def create_news(
     current_user: dict = Depends(require_admin)
 ):
     """إضافة خبر جديد (للمشرفين فقط)"""
-    user = db.query(User).filter(User.email == current_user["email"]).first()
+    user = resolve_user(db, current_user)
     
     news_data = news.model_dump(exclude={"images"})
     
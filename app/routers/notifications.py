@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, select, func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from .. import models, schemas
-from ..database import get_db
+from ..database import get_db, get_async_db
 from ..auth import get_current_user
-from ..firebase import send_push_notification
+from ..jobs import enqueue
+from ..pagination import paginate_async
+from ..dependencies import resolve_user, resolve_user_async
 
 router = APIRouter(
     prefix="/notifications",
@@ -12,27 +17,33 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=list[schemas.NotificationOut])
-def get_notifications(
-    db: Session = Depends(get_db),
+async def get_notifications(
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user),
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: str | None = None
 ):
     """
     Get all notifications.
     accessible to all authenticated users.
     """
-    user = db.query(models.User).filter(models.User.email == current_user["email"]).first()
+    user = await resolve_user_async(db, current_user)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    notifications = db.query(models.Notification).filter(
+    statement = select(models.Notification).where(
         or_(
             models.Notification.recipient_id == None,
             models.Notification.recipient_id == user.id
         )
-    ).order_by(models.Notification.created_at.desc()).offset(skip).limit(limit).all()
-    return notifications
+    )
+    return await paginate_async(
+        db, statement,
+        [models.Notification.created_at, models.Notification.id],
+        response, cursor, skip, limit
+    )
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.NotificationOut)
 def create_notification(
@@ -43,25 +54,22 @@ def create_notification(
     """
     Create a broadcast notification.
     Only Admins can create notifications.
-    Also sends a real push notification via FCM to all registered devices.
+    The FCM push to all registered devices is sent by the job worker.
     """
     if current_user["role"] != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to create notifications")
 
-    user = db.query(models.User).filter(models.User.email == current_user["email"]).first()
+    user = resolve_user(db, current_user)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
     new_notification = models.Notification(**notification.model_dump(), author_id=user.id)
     db.add(new_notification)
+    # Queue the FCM push to all devices
+    enqueue(db, "push.broadcast", title=notification.title, body=notification.body)
     db.commit()
     db.refresh(new_notification)
 
-    # Send FCM push notification to all users with registered tokens
-    tokens = [u.fcm_token for u in db.query(models.User).filter(models.User.fcm_token != None).all()]
-    if tokens:
-        send_push_notification(tokens, notification.title, notification.body)
-
     return new_notification
 
 
@@ -72,13 +80,29 @@ def register_fcm_token(
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Register or update the user's FCM device token.
+    Register or update one of the user's FCM device tokens.
     Called by the Flutter app after obtaining a token from Firebase.
+    Each device keeps its own row; a token seen again is moved to the
+    current user and its last_seen refreshed.
     """
-    user = db.query(models.User).filter(models.User.email == current_user["email"]).first()
+    user = resolve_user(db, current_user)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    user.fcm_token = payload.token
+    insert = postgresql_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+    statement = insert(models.DeviceToken).values(
+        user_id=user.id,
+        token=payload.token,
+        platform=payload.platform,
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[models.DeviceToken.token],
+        set_={
+            "user_id": user.id,
+            "platform": func.coalesce(statement.excluded.platform, models.DeviceToken.platform),
+            "last_seen": func.now(),
+        },
+    )
+    db.execute(statement)
     db.commit()
     return {"message": "FCM token registered successfully"}
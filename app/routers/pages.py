@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Request
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
+from ..utils.email import conf
 
 router = APIRouter()
 
-templates = Jinja2Templates(directory="app/templates")
+# Its own environment, so page helpers such as url_for stay out of the email templates
+templates = Jinja2Templates(directory=conf.TEMPLATE_FOLDER)
 
 @router.get("/privacy-policy", response_class=HTMLResponse)
 async def privacy_policy(request: Request):
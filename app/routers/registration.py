@@ -2,23 +2,20 @@ from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File,
 from sqlalchemy.orm import Session
 from ..database import get_db
 from ..models import User
-from ..auth import hash_password
+from ..auth import hash_password_async
 from ..middleware import limiter
-import shutil
-import os
+from ..jobs import enqueue
+from ..config import settings
+from ..storage import get_storage
+from ..utils.files import store_upload
+from ..utils.images import save_image
 import uuid
 
 router = APIRouter(tags=["Registration"])
 
-DOCUMENT_DIR = "app/static/documents"
-os.makedirs(DOCUMENT_DIR, exist_ok=True)
-
-PROFILE_DIR = "app/static/profiles"
-os.makedirs(PROFILE_DIR, exist_ok=True)
-
 ALLOWED_TYPES = {"image/jpeg", "image/png", "image/jpg", "application/pdf"}
 IMAGE_TYPES = {"image/jpeg", "image/png", "image/jpg"}
-MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+MAX_FILE_SIZE = settings.MAX_UPLOAD_SIZE
 
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
@@ -54,62 +51,55 @@ async def register_with_document(
             detail="Invalid file type. Allowed: JPEG, PNG, PDF"
         )
 
-    # Validate file size
-    contents = await document.read()
-    if len(contents) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File too large. Maximum size: 5MB"
-        )
-    await document.seek(0)
+    # Hash before storing anything: under load the hasher refuses work (503)
+    password_hash = await hash_password_async(password)
 
-    # Save document with secure filename
+    # Stream the document to storage, rejecting it once it passes the size limit
     extension = document.filename.split(".")[-1] if document.filename else "bin"
-    secure_filename = f"{uuid.uuid4()}.{extension}"
-    file_path = os.path.join(DOCUMENT_DIR, secure_filename)
+    document_key = await store_upload(document, f"documents/{uuid.uuid4()}.{extension}", MAX_FILE_SIZE)
+
+    try:
+        # Save profile image if provided (oversized or unreadable images are skipped)
+        profile_image_url = None
+        if profile_image is not None:
+            if profile_image.content_type in IMAGE_TYPES:
+                try:
+                    variants = await save_image(profile_image, "profiles", MAX_FILE_SIZE)
+                    profile_image_url = get_storage().url(variants["original"])
+                except HTTPException:
+                    pass
 
-    with open(file_path, "wb") as buffer:
-        buffer.write(contents)
+        # Create user with pending status
+        new_user = User(
+            name=name,
+            email=email,
+            password=password_hash,
+            role="user",
+            university=university,
+            specialization=specialization,
+            academic_year=academic_year,
+            degree=degree,
+            date_of_birth=date_of_birth,
+            status="pending",
+            document_path=document_key,
+            profile_image=profile_image_url,
+        )
+        db.add(new_user)
 
-    # Save profile image if provided
-    profile_image_url = None
-    if profile_image is not None:
-        if profile_image.content_type in IMAGE_TYPES:
-            img_contents = await profile_image.read()
-            if len(img_contents) <= MAX_FILE_SIZE:
-                img_ext = profile_image.filename.split(".")[-1] if profile_image.filename else "jpg"
-                img_filename = f"{uuid.uuid4()}.{img_ext}"
-                img_path = os.path.join(PROFILE_DIR, img_filename)
-                with open(img_path, "wb") as f:
-                    f.write(img_contents)
-                profile_image_url = f"https://api.sdotist.org/static/profiles/{img_filename}"
+        # Queue verification email with the user so neither is saved without the other
+        from ..auth import create_access_token
+        token = create_access_token({"sub": new_user.email, "role": new_user.role})
+        enqueue(db, "email.verification", email=new_user.email, name=new_user.name, token=token)
 
-    # Create user with pending status
-    new_user = User(
-        name=name,
-        email=email,
-        password=hash_password(password),
-        role="user",
-        university=university,
-        specialization=specialization,
-        academic_year=academic_year,
-        degree=degree,
-        date_of_birth=date_of_birth,
-        status="pending",
-        document_path=file_path,
-        profile_image=profile_image_url,
-    )
-    db.add(new_user)
-    db.commit()
+        db.commit()
+    except Exception:
+        # No account points at the document, so it must not stay behind.
+        # Profile images are shared by content hash and are left alone.
+        db.rollback()
+        await get_storage().delete([document_key])
+        raise
     db.refresh(new_user)
 
-    # Send verification email
-    from ..auth import create_access_token
-    from ..utils.email import send_verification_email
-    token = create_access_token({"sub": new_user.email, "role": new_user.role})
-    import asyncio
-    asyncio.create_task(send_verification_email(new_user.email, new_user.name, token))
-
     return {
         "message": "Registration submitted. Your account is under review.",
         "user_id": new_user.id,
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from .. import models, database
 
 router = APIRouter(
@@ -8,12 +9,17 @@ router = APIRouter(
 )
 
 @router.get("/")
-def get_statistics(db: Session = Depends(database.get_db)):
+async def get_statistics(db: AsyncSession = Depends(database.get_async_db)):
     """
     Get aggregated statistics for the application
     """
-    total_users = db.query(models.User).count()
-    total_events = db.query(models.Event).count()
+    result = await db.execute(
+        select(
+            select(func.count(models.User.id)).scalar_subquery(),
+            select(func.count(models.Event.id)).scalar_subquery(),
+        )
+    )
+    total_users, total_events = result.one()
     
     return {
         "total_users": total_users,
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import UniversityRepresentative
 from app.schemas import UniversityRepresentativeCreate, UniversityRepresentativeUpdate, UniversityRepresentativeOut
-from app.dependencies import admin_only, get_current_user
+from app.dependencies import require_admin
+from app.pagination import paginate
 
 router = APIRouter(
     prefix="/representatives",
@@ -11,15 +12,25 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=list[UniversityRepresentativeOut])
-def get_representatives(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_representatives(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    db: Session = Depends(get_db)
+):
     "List all university representatives"
-    return db.query(UniversityRepresentative).offset(skip).limit(limit).all()
+    return paginate(
+        db.query(UniversityRepresentative),
+        [UniversityRepresentative.id],
+        response, cursor, skip, limit, descending=False
+    )
 
 @router.post("/", response_model=UniversityRepresentativeOut, status_code=status.HTTP_201_CREATED)
 def create_representative(
     representative: UniversityRepresentativeCreate, 
     db: Session = Depends(get_db),
-    current_user: dict = Depends(admin_only)
+    current_user: dict = Depends(require_admin)
 ):
     "Create a new university representative (Admin only)"
     new_rep = UniversityRepresentative(**representative.model_dump())
@@ -34,7 +45,7 @@ def update_representative(
     rep_id: int,
     rep_data: UniversityRepresentativeUpdate,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(admin_only)
+    current_user: dict = Depends(require_admin)
 ):
     """Update a university representative (Admin only)"""
     rep = db.query(UniversityRepresentative).filter(UniversityRepresentative.id == rep_id).first()
@@ -53,7 +64,7 @@ def update_representative(
 def delete_representative(
     rep_id: int, 
     db: Session = Depends(get_db),
-    current_user: dict = Depends(admin_only)
+    current_user: dict = Depends(require_admin)
 ):
     "Delete a university representative (Admin only)"
     rep = db.query(UniversityRepresentative).filter(UniversityRepresentative.id == rep_id).first()
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request
-import shutil
-import os
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request, status
+from .. import schemas
+from ..dependencies import get_current_active_user
+from ..config import settings
+from ..storage import get_storage
+from ..utils.images import save_image
 import uuid
 
 router = APIRouter(tags=["Upload"])
 
-UPLOAD_DIR = "app/static/uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Direct uploads are stored and served exactly as sent, so only raster formats
+# browsers cannot execute script from (no SVG/HTML); the extension comes from
+# this table, never from the client's filename
+DIRECT_UPLOAD_EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp"}
 
 @router.post("/upload")
 async def upload_image(request: Request, file: UploadFile = File(...)):
@@ -14,17 +19,32 @@ async def upload_image(request: Request, file: UploadFile = File(...)):
     if not file.content_type.startswith("image/"):
         raise HTTPException(400, "File must be an image")
     
-    # Generate unique filename
-    extension = file.filename.split(".")[-1]
-    filename = f"{uuid.uuid4()}.{extension}"
-    file_path = f"{UPLOAD_DIR}/{filename}"
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    # Return URL dynamically based on request host (handles both localhost and sdotist.org)
-    # Generate full URL
-    # Hardcoding production domain to avoid proxy issues
-    base_url = "https://api.sdotist.org/"
-    url = f"{base_url}static/uploads/{filename}"
-    return {"url": url}
+    # Resized, metadata-free image plus thumbnails
+    variants = await save_image(file, "uploads", settings.MAX_UPLOAD_SIZE)
+
+    # Public URLs come from the storage backend (api.sdotist.org/static or the bucket/CDN)
+    storage = get_storage()
+    urls = {name: storage.url(key) for name, key in variants.items()}
+    return {"url": urls["original"], "variants": urls}
+
+
+@router.post("/upload/presign")
+def presign_upload(
+    data: schemas.PresignedUploadRequest,
+    current_user: schemas.CurrentUser = Depends(get_current_active_user),
+):
+    """رابط رفع مباشر إلى التخزين دون المرور بالخادم (تخزين S3 فقط)"""
+    extension = DIRECT_UPLOAD_EXTENSIONS.get(data.content_type.lower())
+    if extension is None:
+        raise HTTPException(400, "File must be a JPEG, PNG or WebP image")
+
+    # Direct uploads are stored as sent; they skip the resize/thumbnail stage
+    key = f"uploads/direct/{uuid.uuid4()}.{extension}"
+    storage = get_storage()
+    upload = storage.presigned_upload(key, data.content_type.lower(), settings.MAX_UPLOAD_SIZE)
+    if upload is None:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Direct uploads need the S3 storage backend; use /upload"
+        )
+    return {"key": key, "upload": upload, "url": storage.url(key)}
@@ -1,23 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, Response
 from sqlalchemy.orm import Session
-import io
-import qrcode
-from ..database import SessionLocal
+from typing import Literal
+import uuid
+from ..database import get_db
 from ..models import User
-from ..schemas import UserCreate, UserOut, UserUpdate, PasswordChange
-from ..auth import hash_password, verify_password, require_admin, get_current_user
+from ..schemas import UserCreate, UserOut, UserUpdate, PasswordChange, CurrentUser
+from ..auth import hash_password, verify_password, create_access_token, create_refresh_token, token_claims
+from ..pagination import paginate
+from ..dependencies import get_current_active_user, get_current_user_row, require_admin
+from ..cache import invalidate_user
+from ..jobs import enqueue
+from ..utils.qrcodes import MEDIA_TYPES, get_qr_image, invalidate_qr, qr_etag, snap_size
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.post("/", response_model=UserOut, status_code=status.HTTP_201_CREATED)
 def create_user(user: UserCreate, db: Session = Depends(get_db)):
     """إنشاء مستخدم جديد"""
@@ -45,50 +42,49 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
         is_verified=False # Explicitly set false
     )
     db.add(new_user)
+
+    # Queue verification email
+    token = create_access_token({"sub": new_user.email, "role": new_user.role})
+    enqueue(db, "email.verification", email=new_user.email, name=new_user.name, token=token)
+
     db.commit()
     db.refresh(new_user)
     
-    # Send verification email
-    from ..auth import create_access_token
-    from ..utils.email import send_verification_email
-    token = create_access_token({"sub": new_user.email, "role": new_user.role})
-    import asyncio
-    asyncio.create_task(send_verification_email(new_user.email, token))
-    
     return new_user
 
 
 @router.get("/", response_model=list[UserOut])
 def get_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: str | None = None,
     db: Session = Depends(get_db)
 ):
     """الحصول على قائمة المستخدمين"""
-    return db.query(User).offset(skip).limit(limit).all()
+    return paginate(db.query(User), [User.id], response, cursor, skip, limit, descending=False)
 
 
 @router.get("/me", response_model=UserOut)
-def get_me(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+def get_me(current_user: UserOut = Depends(get_current_active_user)):
     """الحصول على بيانات المستخدم الحالي"""
-    user = db.query(User).filter(User.email == current_user["email"]).first()
-    return user
+    return current_user
 
 
 @router.put("/me", response_model=UserOut)
 def update_me(
     user_data: UserUpdate,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    user: User = Depends(get_current_user_row)
 ):
     """تحديث الملف الشخصي للمستخدم الحالي"""
-    user = db.query(User).filter(User.email == current_user["email"]).first()
-    
+    previous_email = user.email
     update_data = user_data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(user, field, value)
 
     db.commit()
+    invalidate_user(user.id, previous_email, user.email)
     db.refresh(user)
     return user
 
@@ -96,35 +92,57 @@ def update_me(
 @router.delete("/me", status_code=status.HTTP_204_NO_CONTENT)
 def delete_me(
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    user: User = Depends(get_current_user_row)
 ):
     """حذف الحساب للمستخدم الحالي"""
-    user = db.query(User).filter(User.email == current_user["email"]).first()
     db.delete(user)
     db.commit()
+    invalidate_user(user.id, user.email)
     return None
 
 
+QR_CACHE_CONTROL = "private, no-cache"
+
+
 @router.get("/me/barcode")
 def get_my_barcode(
+    request: Request,
+    size: int | None = Query(None, ge=64, le=1024, description="عرض صورة PNG بالبكسل"),
+    format: Literal["png", "svg"] = "png",
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    user: User = Depends(get_current_user_row),
 ):
     """الحصول على الباركود الخاص بالمستخدم"""
-    user = db.query(User).filter(User.email == current_user["email"]).first()
-    
+    # Read from the row, not the per-worker user cache: after a rotation on
+    # another worker the cached barcode would still be served
     if not user.barcode_id:
-        import uuid
         user.barcode_id = str(uuid.uuid4())
         db.commit()
+        invalidate_user(user.id, user.email)
+    barcode_id = user.barcode_id
 
-    # Generate QR Code
-    img = qrcode.make(user.barcode_id)
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    buf.seek(0)
-    
-    return Response(content=buf.getvalue(), media_type="image/png")
+    # The app keeps the image and revalidates it; an unchanged barcode costs a 304
+    size = snap_size(size) if format == "png" else None
+    headers = {"ETag": qr_etag(barcode_id, format, size), "Cache-Control": QR_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    content = get_qr_image(barcode_id, format, size)
+    return Response(content=content, media_type=MEDIA_TYPES[format], headers=headers)
+
+
+@router.post("/me/barcode/rotate")
+def rotate_my_barcode(
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user_row)
+):
+    """تغيير الباركود (مثلاً عند مشاركته أو فقدانه)"""
+    old_barcode_id = user.barcode_id
+    user.barcode_id = str(uuid.uuid4())
+    db.commit()
+    invalidate_user(user.id, user.email)
+    invalidate_qr(old_barcode_id)
+    return {"barcode_id": user.barcode_id}
 
 
 @router.get("/{user_id}", response_model=UserOut)
@@ -154,11 +172,17 @@ def update_user(
             detail="المستخدم غير موجود"
         )
 
+    previous_email = user.email
     update_data = user_data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(user, field, value)
 
+    # Tokens carry the role, so a role change revokes the ones already issued
+    if "role" in update_data:
+        user.token_version = (user.token_version or 0) + 1
+
     db.commit()
+    invalidate_user(user.id, previous_email, user.email)
     db.refresh(user)
     return user
 
@@ -179,6 +203,7 @@ def delete_user(
 
     db.delete(user)
     db.commit()
+    invalidate_user(user.id, user.email)
     return None
 
 
@@ -186,21 +211,28 @@ def delete_user(
 def change_password(
     password_data: PasswordChange,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    user: User = Depends(get_current_user_row)
 ):
     """تغيير كلمة المرور"""
-    user = db.query(User).filter(User.email == current_user["email"]).first()
-
     if not verify_password(password_data.current_password, user.password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="كلمة المرور الحالية غير صحيحة"
         )
 
+    # Revoke tokens issued with the old password and hand back fresh ones
     user.password = hash_password(password_data.new_password)
+    user.token_version = (user.token_version or 0) + 1
     db.commit()
+    invalidate_user(user.id, user.email)
 
-    return {"message": "تم تغيير كلمة المرور بنجاح ✅"}
+    token_data = token_claims(user)
+    return {
+        "message": "تم تغيير كلمة المرور بنجاح ✅",
+        "access_token": create_access_token(token_data),
+        "refresh_token": create_refresh_token(token_data),
+        "token_type": "bearer"
+    }
 
 
 @router.get("/admin/dashboard")
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
 from datetime import datetime
+from typing import Literal
 
 
 class UserCreate(BaseModel):
@@ -51,6 +52,11 @@ class UserOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class CurrentUser(UserOut):
+    """Cached snapshot of the authenticated user"""
+    token_version: int = 0
+
+
 class PendingUserOut(BaseModel):
     id: int
     name: str
@@ -59,12 +65,27 @@ class PendingUserOut(BaseModel):
     specialization: str | None = None
     degree: str | None = None
     academic_year: str | None = None
+    profile_image: str | None = None
     document_url: str | None = None
     created_at: datetime | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class PresignedUploadRequest(BaseModel):
+    filename: str = Field(..., description="اسم الملف")
+    content_type: str = Field(..., description="نوع الملف (image/...)")
+
+
+class RegistrationBulkAction(BaseModel):
+    user_ids: list[int] = Field(..., min_length=1, max_length=1000, description="معرفات المستخدمين")
+
+
+class RegistrationBulkResult(BaseModel):
+    user_id: int
+    status: str  # approved / rejected / not_found / not_pending
+
+
 class Token(BaseModel):
     access_token: str
     refresh_token: str | None = None
@@ -74,6 +95,8 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     email: str | None = None
     role: str | None = None
+    id: int | None = None
+    token_version: int | None = None
 
 
 class NewsBase(BaseModel):
@@ -136,6 +159,7 @@ class NotificationOut(NotificationBase):
 
 class FCMTokenRegister(BaseModel):
     token: str = Field(..., description="FCM device token")
+    platform: str | None = Field(None, description="android / ios / web")
 
 
 class OfficeMemberBase(BaseModel):
@@ -230,14 +254,46 @@ class EventRegistrationOut(BaseModel):
     event_id: int
     registered_at: datetime
     attended: bool
+    attended_at: datetime | None = None
     user: UserOut # Include user details
 
     model_config = ConfigDict(from_attributes=True)
 
+class CheckInScan(BaseModel):
+    barcode_id: str
+    scanned_at: datetime | None = Field(None, description="وقت المسح (للمسح دون اتصال)")
+
+class CheckInBatch(BaseModel):
+    scans: list[CheckInScan] = Field(..., min_length=1, max_length=1000)
+
+class CheckInResult(BaseModel):
+    barcode_id: str
+    status: Literal["checked_in", "already_checked_in", "not_registered", "unknown_barcode", "duplicate"]
+    registration_id: int | None = None
+    user_id: int | None = None
+    name: str | None = None
+    attended_at: datetime | None = None
+
+class CheckInBatchOut(BaseModel):
+    checked_in: int
+    results: list[CheckInResult]
+
 class EventOut(EventBase):
     id: int
     created_at: datetime
     updated_at: datetime | None = None
     registrations: list[EventRegistrationOut] = []
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class EventSummaryOut(BaseModel):
+    id: int
+    title: str
+    date: datetime
+    location: str
+    image_url: str | None = None
+    is_ended: bool = False
+    registration_count: int = 0
+    attended_count: int = 0
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,182 @@
+"""
+Static file serving for /static.
+
+    python -m app.static_files [directory]
+
+pre-builds .gz (and .br, when the brotli package is installed) next to the
+HTML/CSS/JS assets so they are served compressed without per-request work.
+"""
+import gzip
+import hashlib
+import hmac
+import mimetypes
+import os
+import re
+import sys
+import time
+from starlette.datastructures import Headers, QueryParams
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from .config import settings
+
+try:
+    import brotli
+except ImportError:  # optional, only needed to build .br variants
+    brotli = None
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+PRIVATE_CACHE_CONTROL = "private, no-store"
+
+# Public, never-rewritten uploads; only these may be cached by shared caches
+IMMUTABLE_PREFIXES = ("uploads/", "profiles/")
+# Private files (student ID documents): only reachable through signed,
+# expiring URLs and never stored by browsers, proxies or CDNs
+PRIVATE_PREFIXES = ("documents/",)
+
+# Files named after the SHA-256 of their content (optionally with a _<size>
+# thumbnail suffix) or after a random uuid are never rewritten in place, so
+# clients may cache them forever
+CONTENT_ADDRESSED_NAME = re.compile(r"^([0-9a-f]{64})(_\d+)?\.\w+$")
+UUID_NAME = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.\w+$")
+
+
+def is_immutable_name(filename: str) -> bool:
+    return bool(CONTENT_ADDRESSED_NAME.match(filename) or UUID_NAME.match(filename))
+
+
+def is_private_key(key: str) -> bool:
+    return key.startswith(PRIVATE_PREFIXES)
+
+
+def cache_control_for(key: str) -> str:
+    """Cache-Control for a stored file, by its key (path under the storage root)"""
+    if is_private_key(key):
+        return PRIVATE_CACHE_CONTROL
+    if key.startswith(IMMUTABLE_PREFIXES) and is_immutable_name(os.path.basename(key)):
+        return IMMUTABLE_CACHE_CONTROL
+    return REVALIDATE_CACHE_CONTROL
+
+
+def _private_signature(key: str, expires: int) -> str:
+    secret = hmac.new(settings.SECRET_KEY.encode(), b"private-static-files", hashlib.sha256).digest()
+    return hmac.new(secret, f"{key}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+
+def sign_private_key(key: str, expires_in: int) -> str:
+    """Query string granting access to a private file for ``expires_in`` seconds"""
+    expires = int(time.time()) + expires_in
+    return f"expires={expires}&signature={_private_signature(key, expires)}"
+
+
+def verify_private_key(key: str, query: QueryParams) -> bool:
+    try:
+        expires = int(query.get("expires", ""))
+    except ValueError:
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(query.get("signature", ""), _private_signature(key, expires))
+
+
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".js", ".mjs", ".json", ".svg", ".txt", ".map", ".xml", ".wasm"}
+# Preferred first
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _accepted_encodings(request_headers: Headers) -> set[str]:
+    accepted = set()
+    for part in request_headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(coding.lower())
+    return accepted
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles with long-lived caching for immutable uploads.
+
+    - hash and uuid named files under uploads/ and profiles/ get
+      ``Cache-Control: immutable`` for a year; hash named ones also get their
+      content hash as a strong ETag
+    - documents/ is private: served only with a valid signature from
+      ``sign_private_key`` and with ``Cache-Control: private, no-store``
+    - everything else must be revalidated, which costs a 304 thanks to the ETag
+    - a pre-built ``.br``/``.gz`` next to an HTML/CSS/JS asset is sent instead
+      of the original when the client accepts that encoding
+
+    Range requests and If-None-Match are handled by FileResponse, which uses
+    the server's sendfile/pathsend extension when it offers one.
+    """
+
+    async def get_response(self, path, scope):
+        key = os.path.normpath(path).replace(os.sep, "/").lstrip("/")
+        if is_private_key(key) and not verify_private_key(key, QueryParams(scope["query_string"])):
+            # Same answer as a missing file: don't reveal which documents exist
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        filename = os.path.basename(full_path)
+        key = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        headers = {}
+        media_type = None
+
+        if os.path.splitext(filename)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            headers["Vary"] = "Accept-Encoding"
+            accepted = _accepted_encodings(request_headers)
+            for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+                if encoding not in accepted:
+                    continue
+                try:
+                    compressed_stat = os.stat(f"{full_path}{suffix}")
+                except OSError:
+                    continue
+                media_type = mimetypes.guess_type(filename)[0] or "text/plain"
+                headers["Content-Encoding"] = encoding
+                full_path, stat_result = f"{full_path}{suffix}", compressed_stat
+                break
+
+        content_hash = CONTENT_ADDRESSED_NAME.match(filename)
+        if content_hash:
+            headers["ETag"] = f'"{content_hash.group(1)}{content_hash.group(2) or ""}"'
+        headers["Cache-Control"] = cache_control_for(key)
+
+        response = FileResponse(
+            full_path, status_code=status_code, stat_result=stat_result,
+            headers=headers, media_type=media_type,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def precompress_assets(directory: str) -> int:
+    """Write .gz/.br variants for compressible assets that are missing or stale"""
+    written = 0
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            if os.path.splitext(filename)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            path = os.path.join(root, filename)
+            with open(path, "rb") as f:
+                data = f.read()
+            variants = [(".gz", lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append((".br", lambda d: brotli.compress(d, quality=11)))
+            for suffix, compress in variants:
+                target = path + suffix
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                    continue
+                with open(target, "wb") as f:
+                    f.write(compress(data))
+                written += 1
+    return written
+
+
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else "app/static"
+    print(f"Wrote {precompress_assets(directory)} compressed files under {directory}")
@@ -0,0 +1,247 @@
+import asyncio
+import errno
+import logging
+import os
+import shutil
+import tempfile
+from functools import lru_cache
+from .config import settings
+from .static_files import cache_control_for, is_private_key, sign_private_key
+
+logger = logging.getLogger(__name__)
+
+LEGACY_LOCAL_PREFIX = "app/static/"
+
+
+def storage_key(path: str) -> str:
+    """Storage key for a stored file reference; older rows hold local paths"""
+    if path.startswith(LEGACY_LOCAL_PREFIX):
+        return path[len(LEGACY_LOCAL_PREFIX):]
+    return path
+
+
+class StorageBackend:
+    """
+    Where uploaded files live, addressed by keys such as ``uploads/ab/cd/<hash>.webp``.
+
+    Blocking I/O runs in worker threads; every method is safe to call from
+    request handlers.
+    """
+
+    async def save(self, source_path: str, key: str, content_type: str | None = None) -> None:
+        """Move a finished local file to ``key`` (the local file is consumed)"""
+        raise NotImplementedError
+
+    async def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    async def delete(self, keys: list[str]) -> None:
+        """Remove objects; missing keys are ignored"""
+        raise NotImplementedError
+
+    def url(self, key: str) -> str:
+        """Public URL of a publicly readable object (uploads, profile images)"""
+        raise NotImplementedError
+
+    def download_url(self, key: str) -> str:
+        """URL for a private object (documents); time-limited where supported"""
+        return self.url(key)
+
+    def presigned_upload(self, key: str, content_type: str, max_size: int) -> dict | None:
+        """Form fields for a direct browser upload, or None when uploads must go through the API"""
+        return None
+
+
+class LocalStorage(StorageBackend):
+    """Files under a local directory, served by the /static mount"""
+
+    def __init__(self, root: str, base_url: str, private_url_expires: int = 900):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+        self.private_url_expires = private_url_expires
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def _save(self, source_path: str, key: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.replace(source_path, path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Different filesystem (e.g. /tmp): copy next to the target, then rename
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".storage-", suffix=".part")
+            os.close(fd)
+            try:
+                shutil.copyfile(source_path, temp_path)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+            os.remove(source_path)
+        os.chmod(path, 0o644)
+
+    async def save(self, source_path: str, key: str, content_type: str | None = None) -> None:
+        await asyncio.to_thread(self._save, source_path, key)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(os.path.exists, self._path(key))
+
+    def _delete(self, keys: list[str]) -> None:
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    async def delete(self, keys: list[str]) -> None:
+        await asyncio.to_thread(self._delete, keys)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def download_url(self, key: str) -> str:
+        if is_private_key(key):
+            # /static only serves private files with a valid, unexpired signature
+            return f"{self.url(key)}?{sign_private_key(key, self.private_url_expires)}"
+        return self.url(key)
+
+
+class S3Storage(StorageBackend):
+    """
+    Objects in an S3-compatible bucket (AWS S3, MinIO, R2, ...).
+
+    Public files are read straight from the bucket or CDN, and clients can
+    upload directly with a presigned POST, so file bytes never pass through
+    the API workers. Private documents live in ``private_bucket``, which
+    must not be publicly readable, and are only handed out as presigned GET
+    URLs.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: str | None = None,
+        region: str | None = None,
+        access_key_id: str | None = None,
+        secret_access_key: str | None = None,
+        public_base_url: str | None = None,
+        presign_expires: int = 900,
+        private_bucket: str | None = None,
+    ):
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.private_bucket = private_bucket or bucket
+        self.presign_expires = presign_expires
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            config=Config(signature_version="s3v4", max_pool_connections=20),
+        )
+        if public_base_url:
+            self.public_base_url = public_base_url.rstrip("/")
+        elif endpoint_url:
+            self.public_base_url = f"{endpoint_url.rstrip('/')}/{bucket}"
+        else:
+            self.public_base_url = f"https://{bucket}.s3.{region or 'us-east-1'}.amazonaws.com"
+
+    def _bucket(self, key: str) -> str:
+        return self.private_bucket if is_private_key(key) else self.bucket
+
+    def _save(self, source_path: str, key: str, content_type: str | None) -> None:
+        # Never public/immutable for documents, so no CDN keeps a copy
+        extra = {"CacheControl": cache_control_for(key)}
+        if content_type:
+            extra["ContentType"] = content_type
+        self.client.upload_file(source_path, self._bucket(key), key, ExtraArgs=extra)
+        os.remove(source_path)
+
+    async def save(self, source_path: str, key: str, content_type: str | None = None) -> None:
+        await asyncio.to_thread(self._save, source_path, key, content_type)
+
+    def _exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self._bucket(key), Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._exists, key)
+
+    def _delete(self, keys: list[str]) -> None:
+        by_bucket: dict[str, list[str]] = {}
+        for key in keys:
+            by_bucket.setdefault(self._bucket(key), []).append(key)
+        # DeleteObjects accepts up to 1000 keys per call
+        for bucket, bucket_keys in by_bucket.items():
+            for start in range(0, len(bucket_keys), 1000):
+                self.client.delete_objects(
+                    Bucket=bucket,
+                    Delete={"Objects": [{"Key": key} for key in bucket_keys[start:start + 1000]], "Quiet": True},
+                )
+
+    async def delete(self, keys: list[str]) -> None:
+        if keys:
+            await asyncio.to_thread(self._delete, keys)
+
+    def url(self, key: str) -> str:
+        return f"{self.public_base_url}/{key}"
+
+    def download_url(self, key: str) -> str:
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self._bucket(key), "Key": key}, ExpiresIn=self.presign_expires
+        )
+
+    def presigned_upload(self, key: str, content_type: str, max_size: int) -> dict | None:
+        return self.client.generate_presigned_post(
+            self._bucket(key),
+            key,
+            Fields={"Content-Type": content_type, "Cache-Control": cache_control_for(key)},
+            Conditions=[
+                {"Content-Type": content_type},
+                {"Cache-Control": cache_control_for(key)},
+                ["content-length-range", 1, max_size],
+            ],
+            ExpiresIn=self.presign_expires,
+        )
+
+
+@lru_cache
+def get_storage() -> StorageBackend:
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            public_base_url=settings.S3_PUBLIC_BASE_URL,
+            presign_expires=settings.S3_PRESIGN_EXPIRES_SECONDS,
+            private_bucket=settings.S3_PRIVATE_BUCKET,
+        )
+    return LocalStorage(
+        settings.STORAGE_LOCAL_ROOT,
+        settings.STORAGE_PUBLIC_BASE_URL,
+        private_url_expires=settings.STORAGE_PRIVATE_URL_EXPIRES_SECONDS,
+    )
+
+
+async def delete_objects(keys: list[str]) -> None:
+    """Job handler: remove stored files off the request path"""
+    await get_storage().delete([storage_key(key) for key in keys])
+    logger.info(f"Deleted {len(keys)} stored files")
@@ -1,8 +1,18 @@
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
+import asyncio
+import logging
+import time
+from email.message import EmailMessage
+from email.utils import formataddr
+import aiosmtplib
+from functools import lru_cache
+from fastapi_mail import ConnectionConfig
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template, select_autoescape
 from pydantic import EmailStr
 from ..config import settings
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 conf = ConnectionConfig(
     MAIL_USERNAME=settings.MAIL_USERNAME,
     MAIL_PASSWORD=settings.MAIL_PASSWORD,
@@ -17,6 +27,221 @@ conf = ConnectionConfig(
     TEMPLATE_FOLDER=Path(__file__).parent.parent / 'templates'
 )
 
+EMAIL_TEMPLATES = [
+    "verification_email_ar.html", "verification_email_en.html",
+    "welcome_email_ar.html", "welcome_email_en.html",
+    "approval_email_ar.html", "approval_email_en.html",
+]
+
+# One shared environment: templates are parsed and compiled once and kept in
+# memory; compiled bytecode also survives restarts. Files are only re-checked
+# for changes in DEBUG. Values are HTML-escaped, since names come from users;
+# the cache key ignores that option, hence a file pattern of its own so
+# bytecode compiled without escaping is never loaded.
+template_env = Environment(
+    loader=FileSystemLoader(conf.TEMPLATE_FOLDER),
+    autoescape=select_autoescape(["html"]),
+    bytecode_cache=FileSystemBytecodeCache(pattern="__jinja2_escaped_%s.cache"),
+    auto_reload=settings.DEBUG,
+)
+
+
+def precompile_templates() -> None:
+    """Compile every email template up front so the first send pays nothing"""
+    for name in EMAIL_TEMPLATES:
+        template_env.get_template(name)
+
+
+def render_template(name: str, **variables) -> str:
+    return template_env.get_template(name).render(**variables)
+
+
+def _read_page(name: str) -> str:
+    with open(conf.TEMPLATE_FOLDER / name, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+_cached_page = lru_cache(maxsize=None)(_read_page)
+
+
+def static_page(name: str) -> str:
+    """Contents of a static HTML page from the templates folder, read once"""
+    return _read_page(name) if settings.DEBUG else _cached_page(name)
+
+
+def benchmark_template_render(samples: int = 200) -> dict:
+    """Compare per-render cost of parsing each time against the shared environment"""
+    name = EMAIL_TEMPLATES[0]
+    variables = {"user_name": "Benchmark", "verification_link": "https://example.com", "expiry_minutes": "30"}
+
+    start = time.perf_counter()
+    for _ in range(samples):
+        Template(_read_page(name)).render(**variables)
+    uncached = (time.perf_counter() - start) / samples
+
+    render_template(name, **variables)
+    start = time.perf_counter()
+    for _ in range(samples):
+        render_template(name, **variables)
+    cached = (time.perf_counter() - start) / samples
+
+    return {
+        "samples": samples,
+        "uncached_ms": uncached * 1000,
+        "cached_ms": cached * 1000,
+        "speedup": uncached / cached,
+    }
+
+
+# Errors after which the SMTP session is unusable and must be reopened
+RECONNECT_ERRORS = (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, ConnectionError)
+
+
+class SMTPMailer:
+    """
+    Keeps one authenticated SMTP session open and reuses it for every message.
+
+    Opening a session costs a TCP + TLS handshake and an AUTH round trip, which
+    is most of the time spent sending a single email. The session is closed
+    after ``idle_timeout`` seconds without traffic, and reopened (once per
+    message) when the server drops it. Messages are sent one at a time over the
+    session, so concurrent callers queue on the lock instead of opening more
+    connections.
+    """
+
+    def __init__(self, config: ConnectionConfig, idle_timeout: float):
+        self.config = config
+        self.idle_timeout = idle_timeout
+        self._smtp: aiosmtplib.SMTP | None = None
+        self._lock: asyncio.Lock | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._last_used = 0.0
+        self._idle_handle: asyncio.TimerHandle | None = None
+        self.stats = {"connections": 0, "messages": 0, "reconnects": 0}
+
+    def _bind_loop(self) -> asyncio.Lock:
+        # A session belongs to the event loop that opened it
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            if self._idle_handle is not None:
+                self._idle_handle.cancel()
+            if self._smtp is not None:
+                # Can't QUIT on the old loop from here; drop the socket instead
+                try:
+                    self._smtp.close()
+                except Exception:
+                    pass
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._smtp = None
+            self._idle_handle = None
+        return self._lock
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.config.MAIL_SERVER,
+            port=self.config.MAIL_PORT,
+            timeout=self.config.TIMEOUT,
+            use_tls=self.config.MAIL_SSL_TLS,
+            start_tls=self.config.MAIL_STARTTLS,
+            validate_certs=self.config.VALIDATE_CERTS,
+            local_hostname=self.config.LOCAL_HOSTNAME,
+            cert_bundle=self.config.CERT_BUNDLE,
+        )
+        await smtp.connect()
+        if self.config.USE_CREDENTIALS:
+            await smtp.login(self.config.MAIL_USERNAME, self.config.MAIL_PASSWORD.get_secret_value())
+        self.stats["connections"] += 1
+        return smtp
+
+    async def _session(self) -> aiosmtplib.SMTP:
+        expired = time.monotonic() - self._last_used > self.idle_timeout
+        if self._smtp is not None and (expired or not self._smtp.is_connected):
+            await self._disconnect()
+        if self._smtp is None:
+            self._smtp = await self._connect()
+        return self._smtp
+
+    async def _disconnect(self) -> None:
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except Exception:
+            smtp.close()
+
+    async def _send_one(self, message: EmailMessage) -> None:
+        try:
+            await (await self._session()).send_message(message)
+        except RECONNECT_ERRORS:
+            # The server closed an idle or broken session: reopen once and retry
+            self.stats["reconnects"] += 1
+            await self._disconnect()
+            await (await self._session()).send_message(message)
+        self.stats["messages"] += 1
+
+    def _schedule_idle_close(self) -> None:
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+        self._idle_handle = self._loop.call_later(
+            self.idle_timeout, lambda: self._loop.create_task(self._close_if_idle())
+        )
+
+    async def _close_if_idle(self) -> None:
+        async with self._lock:
+            if time.monotonic() - self._last_used >= self.idle_timeout:
+                await self._disconnect()
+
+    async def send_many(self, messages: list[EmailMessage]) -> list[Exception | None]:
+        """
+        Send ``messages`` over one session.
+
+        A failed message does not stop the batch; the result list holds
+        ``None`` for each delivered message and the exception otherwise.
+        """
+        results: list[Exception | None] = []
+        async with self._bind_loop():
+            for message in messages:
+                try:
+                    await self._send_one(message)
+                    results.append(None)
+                except Exception as e:
+                    logger.error(f"Failed to send email to {message['To']}: {e}")
+                    results.append(e)
+                finally:
+                    self._last_used = time.monotonic()
+            self._schedule_idle_close()
+        return results
+
+    async def send(self, message: EmailMessage) -> None:
+        error = (await self.send_many([message]))[0]
+        if error is not None:
+            raise error
+
+    async def close(self) -> None:
+        if self._loop is not asyncio.get_running_loop():
+            return
+        async with self._lock:
+            if self._idle_handle is not None:
+                self._idle_handle.cancel()
+                self._idle_handle = None
+            await self._disconnect()
+
+
+mailer = SMTPMailer(conf, idle_timeout=settings.MAIL_IDLE_TIMEOUT_SECONDS)
+
+
+def build_message(email: EmailStr, subject: str, html: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((conf.MAIL_FROM_NAME, conf.MAIL_FROM))
+    message["To"] = email
+    message["Subject"] = subject
+    message.set_content(html, subtype="html")
+    return message
+
+
 async def send_verification_email(email: EmailStr, name: str, token: str, language: str = "ar"):
     verification_link = f"https://api.sdotist.org/auth/verify-email?token={token}"
     
@@ -33,25 +258,10 @@ async def send_verification_email(email: EmailStr, name: str, token: str, langua
     
     # Select template based on language
     template_name = "verification_email_en.html" if language == "en" else "verification_email_ar.html"
-    template_path = conf.TEMPLATE_FOLDER / template_name
-    
-    with open(template_path, "r", encoding="utf-8") as f:
-        html = f.read()
-        
-    # Inject variables using Jinja2 Template
-    from jinja2 import Template
-    template = Template(html)
-    html = template.render(**variables)
-
-    message = MessageSchema(
-        subject="Verify your sdotist account" if language == "en" else "تأكيد حسابك في رابطة الطلاب السودانيين باسطنبول",
-        recipients=[email],
-        body=html,
-        subtype=MessageType.html
-    )
-
-    fm = FastMail(conf)
-    await fm.send_message(message)
+    html = render_template(template_name, **variables)
+
+    subject = "Verify your sdotist account" if language == "en" else "تأكيد حسابك في رابطة الطلاب السودانيين باسطنبول"
+    await mailer.send(build_message(email, subject, html))
 
 async def send_welcome_email(email: EmailStr, name: str, language: str = "ar"):
     # Common variables
@@ -66,24 +276,10 @@ async def send_welcome_email(email: EmailStr, name: str, language: str = "ar"):
     
     # Select template based on language
     template_name = "welcome_email_en.html" if language == "en" else "welcome_email_ar.html"
-    template_path = conf.TEMPLATE_FOLDER / template_name
-    
-    with open(template_path, "r", encoding="utf-8") as f:
-        html = f.read()
-        
-    # Inject variables using Jinja2 Template
-    from jinja2 import Template
-    template = Template(html)
-    html = template.render(**variables)
-
-    message = MessageSchema(
-        subject="Welcome to sdotist!" if language == "en" else "مرحباً بك في رابطة الطلاب السودانيين باسطنبول",
-        recipients=[email],
-        body=html,
-        subtype=MessageType.html
-    )
-    fm = FastMail(conf)
-    await fm.send_message(message)
+    html = render_template(template_name, **variables)
+
+    subject = "Welcome to sdotist!" if language == "en" else "مرحباً بك في رابطة الطلاب السودانيين باسطنبول"
+    await mailer.send(build_message(email, subject, html))
 
 async def send_approval_email(email: EmailStr, name: str, language: str = "ar"):
     # Common variables
@@ -98,22 +294,7 @@ async def send_approval_email(email: EmailStr, name: str, language: str = "ar"):
     
     # Select template based on language
     template_name = "approval_email_en.html" if language == "en" else "approval_email_ar.html"
-    template_path = conf.TEMPLATE_FOLDER / template_name
-    
-    with open(template_path, "r", encoding="utf-8") as f:
-        html = f.read()
-        
-    # Inject variables using Jinja2 Template
-    from jinja2 import Template
-    template = Template(html)
-    html = template.render(**variables)
-
-    message = MessageSchema(
-        subject="Account Approved" if language == "en" else "تم تفعيل حسابك",
-        recipients=[email],
-        body=html,
-        subtype=MessageType.html
-    )
-
-    fm = FastMail(conf)
-    await fm.send_message(message)
+    html = render_template(template_name, **variables)
+
+    subject = "Account Approved" if language == "en" else "تم تفعيل حسابك"
+    await mailer.send(build_message(email, subject, html))
@@ -0,0 +1,71 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from fastapi import HTTPException, UploadFile, status
+from ..storage import get_storage
+
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+
+def discard_file(path: str) -> None:
+    """Remove a file if it exists"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"File too large. Maximum size: {max_size // (1024 * 1024)}MB"
+    )
+
+
+def _write_chunk(buffer, hasher, chunk: bytes) -> None:
+    hasher.update(chunk)
+    buffer.write(chunk)
+
+
+async def spool_upload(upload: UploadFile, directory: str, max_size: int) -> tuple[str, str]:
+    """
+    Stream an uploaded file to a temporary file in ``directory``.
+
+    Returns the temporary path and the SHA-256 of the content. The upload is
+    rejected as soon as it passes ``max_size``, so an oversized file is never
+    held in memory, and disk writes (and hashing) run in worker threads.
+    """
+    if upload.size is not None and upload.size > max_size:
+        raise _too_large(max_size)
+
+    fd, temp_path = await asyncio.to_thread(tempfile.mkstemp, dir=directory, prefix=".upload-", suffix=".part")
+    try:
+        size = 0
+        hasher = hashlib.sha256()
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise _too_large(max_size)
+                await asyncio.to_thread(_write_chunk, buffer, hasher, chunk)
+        return temp_path, hasher.hexdigest()
+    except BaseException:
+        await asyncio.to_thread(discard_file, temp_path)
+        raise
+
+
+async def store_upload(upload: UploadFile, key: str, max_size: int) -> str:
+    """Stream an uploaded file into storage under ``key`` and return the key"""
+    temp_path, _ = await spool_upload(upload, tempfile.gettempdir(), max_size)
+    try:
+        await get_storage().save(temp_path, key, upload.content_type)
+    except BaseException:
+        await asyncio.to_thread(discard_file, temp_path)
+        raise
+    return key
+
+
+def shard_prefix(digest: str) -> str:
+    """Two directory levels from a content hash (ab/cd/abcd...), keeping directories small"""
+    return f"{digest[:2]}/{digest[2:4]}"
@@ -0,0 +1,163 @@
+import asyncio
+import multiprocessing
+import os
+import hashlib
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image, ImageOps, UnidentifiedImageError
+from ..config import settings
+from ..storage import get_storage
+from .files import discard_file, shard_prefix, spool_upload
+
+EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg"}
+CONTENT_TYPES = {"WEBP": "image/webp", "JPEG": "image/jpeg"}
+
+# Decoding and re-encoding photos is CPU bound and holds the GIL, so it runs in
+# separate processes instead of the request threads or the event loop.
+_image_executor: ProcessPoolExecutor | None = None
+
+
+def image_executor() -> ProcessPoolExecutor:
+    """
+    The image process pool, started on first use.
+
+    Workers are started by a forkserver (spawn where that is unavailable),
+    not forked from the server: a forked child would inherit its threads'
+    locks, database connections and sockets.
+    """
+    global _image_executor
+    if _image_executor is None:
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _image_executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context(method),
+        )
+    return _image_executor
+
+
+def shutdown_image_executor() -> None:
+    """Stop the image workers (on application shutdown)"""
+    global _image_executor
+    if _image_executor is not None:
+        _image_executor.shutdown(cancel_futures=True)
+        _image_executor = None
+
+
+def _save(image: Image.Image, directory: str, filename: str, image_format: str, quality: int) -> None:
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".image-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            # No exif= argument: metadata (GPS, camera serials) is dropped
+            image.save(buffer, image_format, quality=quality, optimize=True)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, os.path.join(directory, filename))
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def variant_names(stem: str, thumbnail_sizes: list[int], extension: str) -> dict[str, str]:
+    """Variant name -> filename for an image stored under ``stem``"""
+    names = {"original": f"{stem}.{extension}"}
+    for size in sorted(thumbnail_sizes, reverse=True):
+        names[f"thumb_{size}"] = f"{stem}_{size}.{extension}"
+    return names
+
+
+def _process_image(
+    source_path: str,
+    directory: str,
+    stem: str,
+    max_dimension: int,
+    thumbnail_sizes: list[int],
+    image_format: str,
+    quality: int,
+) -> dict[str, str]:
+    """Write the resized image and its thumbnails; returns variant name -> filename"""
+    variants = variant_names(stem, thumbnail_sizes, EXTENSIONS[image_format])
+    os.makedirs(directory, exist_ok=True)
+    with Image.open(source_path) as original:
+        # Apply the camera orientation before the EXIF block is discarded
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA", "L"):
+            image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+        _save(image, directory, variants["original"], image_format, quality)
+        for size in thumbnail_sizes:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size), Image.Resampling.LANCZOS)
+            _save(thumbnail, directory, variants[f"thumb_{size}"], image_format, quality)
+    return variants
+
+
+async def process_image(source_path: str, directory: str, stem: str) -> dict[str, str]:
+    """
+    Re-encode an uploaded image in the process pool.
+
+    The image is capped at IMAGE_MAX_DIMENSION, stripped of metadata and saved
+    as IMAGE_FORMAT together with one thumbnail per IMAGE_THUMBNAIL_SIZES.
+    The uploaded source file is removed afterwards. Files that are not
+    decodable images are rejected with 400.
+    """
+    image_format = settings.IMAGE_FORMAT.upper()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            image_executor(), _process_image, source_path, directory, stem,
+            settings.IMAGE_MAX_DIMENSION, settings.IMAGE_THUMBNAIL_SIZES,
+            image_format, settings.IMAGE_QUALITY,
+        )
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid image file"
+        )
+    finally:
+        await asyncio.to_thread(discard_file, source_path)
+
+
+def _content_key(digest: str) -> str:
+    # The processing profile is part of the key: new settings give new names,
+    # so URLs served as immutable never change content
+    profile = (
+        f"{settings.IMAGE_FORMAT.upper()}:{settings.IMAGE_MAX_DIMENSION}:"
+        f"{settings.IMAGE_QUALITY}:{sorted(settings.IMAGE_THUMBNAIL_SIZES)}"
+    )
+    return hashlib.sha256(f"{digest}:{profile}".encode()).hexdigest()
+
+
+async def save_image(upload: UploadFile, prefix: str, max_size: int) -> dict[str, str]:
+    """
+    Store an uploaded image under the hash of its content.
+
+    Returns variant name -> storage key (``<prefix>/ab/cd/<hash>.webp``).
+    Uploading an image that is already stored returns the existing keys
+    without decoding it again.
+    """
+    image_format = settings.IMAGE_FORMAT.upper()
+    source_path, digest = await spool_upload(upload, tempfile.gettempdir(), max_size)
+    key = _content_key(digest)
+    directory = f"{prefix}/{shard_prefix(key)}"
+    names = variant_names(key, settings.IMAGE_THUMBNAIL_SIZES, EXTENSIONS[image_format])
+    keys = {name: f"{directory}/{filename}" for name, filename in names.items()}
+
+    storage = get_storage()
+    if all(await asyncio.gather(*(storage.exists(k) for k in keys.values()))):
+        await asyncio.to_thread(discard_file, source_path)
+        return keys
+
+    work_dir = await asyncio.to_thread(tempfile.mkdtemp, prefix="image-")
+    try:
+        await process_image(source_path, work_dir, key)
+        await asyncio.gather(*(
+            storage.save(os.path.join(work_dir, names[name]), k, CONTENT_TYPES[image_format])
+            for name, k in keys.items()
+        ))
+    finally:
+        await asyncio.to_thread(shutil.rmtree, work_dir, True)
+    return keys
@@ -0,0 +1,49 @@
+import base64
+import hashlib
+import hmac
+from functools import lru_cache
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from ..config import settings
+
+SIGNATURE_ALGORITHM = "Ed25519"
+
+
+@lru_cache
+def signing_key() -> Ed25519PrivateKey:
+    """
+    Private key for offline check-in manifests; it never leaves the server.
+
+    CHECKIN_MANIFEST_PRIVATE_KEY holds a PEM private key or a base64 raw
+    32-byte seed. When empty, a seed is derived from SECRET_KEY so every
+    worker signs with the same key.
+    """
+    configured = settings.CHECKIN_MANIFEST_PRIVATE_KEY.strip()
+    if configured.startswith("-----BEGIN"):
+        key = serialization.load_pem_private_key(configured.encode(), password=None)
+        if not isinstance(key, Ed25519PrivateKey):
+            raise ValueError("CHECKIN_MANIFEST_PRIVATE_KEY must be an Ed25519 key")
+        return key
+    if configured:
+        return Ed25519PrivateKey.from_private_bytes(base64.b64decode(configured))
+    seed = hmac.new(settings.SECRET_KEY.encode(), b"checkin-manifest", hashlib.sha256).digest()
+    return Ed25519PrivateKey.from_private_bytes(seed)
+
+
+def public_key_bytes() -> bytes:
+    return signing_key().public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+
+
+def key_id() -> str:
+    """Short fingerprint so devices can tell which public key a manifest needs"""
+    return hashlib.sha256(public_key_bytes()).hexdigest()[:16]
+
+
+def sign_digest(digest: bytes) -> str:
+    """Base64 Ed25519 signature of a SHA-256 digest (the manifest is streamed, so it is hashed as it goes)"""
+    return base64.b64encode(signing_key().sign(digest)).decode()
+
+
+def barcode_hash(event_id: int, barcode_id: str) -> str:
+    # Salted per event so a manifest cannot be matched against other events
+    return hashlib.sha256(f"{event_id}:{barcode_id}".encode()).hexdigest()
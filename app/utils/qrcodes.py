@@ -0,0 +1,148 @@
+import glob
+import hashlib
+import io
+import os
+import tempfile
+import time
+import qrcode
+import qrcode.image.svg
+from PIL import Image
+from ..cache import TTLCache
+from ..config import settings
+
+MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+# Requested PNG widths are rounded up to one of these, so a barcode has at
+# most a handful of cached renderings
+QR_SIZES = (128, 256, 512, 1024)
+# How often a worker sweeps QR_CACHE_DIR for expired files
+DISK_PRUNE_INTERVAL_SECONDS = 3600
+_last_prune = 0.0
+
+# barcode_id -> {(format, size): bytes}; one entry per barcode so a rotation
+# drops every rendered variant at once
+qr_cache = TTLCache(settings.QR_CACHE_MAX_SIZE, settings.QR_CACHE_TTL_SECONDS)
+
+
+def snap_size(size: int | None) -> int | None:
+    """Smallest supported width that is at least ``size``"""
+    if size is None:
+        return None
+    return next((s for s in QR_SIZES if s >= size), QR_SIZES[-1])
+
+
+def _digest(barcode_id: str) -> str:
+    # Cache files and ETags never expose the barcode itself
+    return hashlib.sha256(barcode_id.encode()).hexdigest()
+
+
+def qr_etag(barcode_id: str, image_format: str, size: int | None) -> str:
+    return f'"{_digest(barcode_id)[:32]}-{image_format}-{size or "native"}"'
+
+
+def _disk_path(barcode_id: str, image_format: str, size: int | None) -> str:
+    return os.path.join(settings.QR_CACHE_DIR, f"{_digest(barcode_id)}-{size or 'native'}.{image_format}")
+
+
+def _render(barcode_id: str, image_format: str, size: int | None) -> bytes:
+    buf = io.BytesIO()
+    if image_format == "svg":
+        # Vector output scales to any size on the client
+        qrcode.make(barcode_id, image_factory=qrcode.image.svg.SvgPathImage).save(buf)
+        return buf.getvalue()
+
+    img = qrcode.make(barcode_id).get_image()
+    if size:
+        # Nearest neighbour keeps module edges sharp for scanners
+        img = img.resize((size, size), Image.Resampling.NEAREST)
+    img.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+def _read_disk(path: str) -> bytes | None:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_disk(path: str, content: bytes) -> None:
+    os.makedirs(settings.QR_CACHE_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=settings.QR_CACHE_DIR, suffix=".part")
+    with os.fdopen(fd, "wb") as f:
+        f.write(content)
+    os.replace(temp_path, path)
+    _maybe_prune()
+
+
+def prune_disk_cache(max_age: float | None = None, max_files: int | None = None) -> int:
+    """
+    Remove cached images older than ``max_age`` seconds, then the oldest
+    ones beyond ``max_files``. Returns the number of files removed.
+    """
+    max_age = settings.QR_CACHE_TTL_SECONDS if max_age is None else max_age
+    max_files = settings.QR_DISK_CACHE_MAX_FILES if max_files is None else max_files
+    try:
+        entries = [(e.stat().st_mtime, e.path) for e in os.scandir(settings.QR_CACHE_DIR) if e.is_file()]
+    except FileNotFoundError:
+        return 0
+
+    cutoff = time.time() - max_age
+    expired = [path for mtime, path in entries if mtime < cutoff]
+    kept = sorted((entry for entry in entries if entry[0] >= cutoff), reverse=True)
+    removed = 0
+    for path in expired + [path for _, path in kept[max_files:]]:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def _maybe_prune() -> None:
+    global _last_prune
+    now = time.monotonic()
+    if now - _last_prune >= DISK_PRUNE_INTERVAL_SECONDS:
+        _last_prune = now
+        prune_disk_cache()
+
+
+def get_qr_image(barcode_id: str, image_format: str = "png", size: int | None = None) -> bytes:
+    """
+    QR image for a barcode, rendered at most once per format and size.
+
+    Looks in the in-process LRU first, then in the on-disk cache shared by
+    all workers, and only renders on a miss in both. ``size`` is rounded up
+    to one of QR_SIZES; the disk cache is swept of expired files as it grows.
+    """
+    size = snap_size(size)
+    variants = qr_cache.get(barcode_id)
+    if variants is None:
+        variants = {}
+        qr_cache.set(barcode_id, variants)
+    key = (image_format, size)
+    content = variants.get(key)
+    if content is not None:
+        return content
+
+    path = _disk_path(barcode_id, image_format, size)
+    content = _read_disk(path)
+    if content is None:
+        content = _render(barcode_id, image_format, size)
+        _write_disk(path, content)
+    variants[key] = content
+    return content
+
+
+def invalidate_qr(barcode_id: str | None) -> None:
+    """Forget every rendered image of a barcode that was rotated away"""
+    if not barcode_id:
+        return
+    qr_cache.pop(barcode_id)
+    for path in glob.glob(os.path.join(settings.QR_CACHE_DIR, f"{_digest(barcode_id)}-*")):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,25 @@
+"""
+Standalone outbound job worker.
+
+    python -m app.worker
+
+Run it next to the API (with JOB_WORKER_IN_PROCESS=false on the API) so
+emails and pushes never compete with request handling.
+"""
+import asyncio
+import logging
+import signal
+from .jobs import run_worker
+
+
+async def main() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await run_worker(stop)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -26,9 +26,23 @@ class _PendingRegistrationsScreenState extends State<PendingRegistrationsScreen>
   Future<void> _fetchPendingRegistrations() async {
     setState(() => _isLoading = true);
     try {
-      final response = await _apiClient.dio.get(ApiConstants.pendingRegistrations);
+      // The endpoint is paginated: follow X-Next-Cursor until the queue is exhausted
+      final List<dynamic> users = [];
+      String? cursor;
+      do {
+        final response = await _apiClient.dio.get(
+          ApiConstants.pendingRegistrations,
+          queryParameters: {
+            'limit': ApiConstants.pendingRegistrationsPageSize,
+            if (cursor != null) 'cursor': cursor,
+          },
+        );
+        users.addAll(response.data);
+        cursor = response.headers.value(ApiConstants.nextCursorHeader);
+      } while (cursor != null);
+      if (!mounted) return;
       setState(() {
-        _pendingUsers = response.data;
+        _pendingUsers = users;
         _isLoading = false;
       });
     } catch (e) {
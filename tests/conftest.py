@@ -3,6 +3,14 @@ from fastapi.testclient import TestClient
 from app.main import app
 from app.database import SessionLocal, engine
 from app import models
+from app.cache import user_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_user_cache():
+    """Tests create and delete users directly, so start each one with an empty cache"""
+    user_cache.clear()
+    yield
 
 
 @pytest.fixture
@@ -39,3 +39,117 @@ class TestHealthEndpoint:
         data = response.json()
         assert data["status"] == "healthy"
         assert "api" in data
+
+    def test_pool_stats_requires_admin(self):
+        """اختبار حماية إحصائيات مجمع الاتصالات"""
+        response = client.get("/health/db")
+        assert response.status_code == 401
+
+    def test_pool_stats_for_admin(self):
+        """اختبار عرض إحصائيات مجمع الاتصالات للمشرف"""
+        from app.auth import create_access_token
+        from app.database import SessionLocal
+        from app.models import User
+        db = SessionLocal()
+        db.add(User(name="Health Admin", email="health_admin@example.com", password="x", role="admin"))
+        db.commit()
+        try:
+            token = create_access_token({"sub": "health_admin@example.com", "role": "admin"})
+            response = client.get("/health/db", headers={"Authorization": f"Bearer {token}"})
+            assert response.status_code == 200
+            data = response.json()
+            assert data["checkouts"] >= data["checkins"] >= 0
+            assert "max_wait_seconds" in data
+            # Both pools count towards the per-worker connection budget
+            assert data["max_connections_per_worker"] == 45
+        finally:
+            db.query(User).filter(User.email == "health_admin@example.com").delete()
+            db.commit()
+            db.close()
+
+
+class TestPasswordHashing:
+    """اختبارات تشفير كلمات المرور في مجمع الخيوط المخصص"""
+
+    def test_hash_and_verify(self):
+        """اختبار التشفير والتحقق عبر المجمع"""
+        from app.auth import hash_password, verify_password, get_password_hash_stats
+        before = get_password_hash_stats()["completed"]
+        hashed = hash_password("somepassword1")
+        assert verify_password("somepassword1", hashed)
+        assert not verify_password("otherpassword", hashed)
+        stats = get_password_hash_stats()
+        assert stats["completed"] == before + 3
+        assert stats["queued"] == 0
+        assert stats["running"] == 0
+
+    def test_async_hash_does_not_block_event_loop(self):
+        """اختبار أن التشفير غير المتزامن لا يوقف حلقة الأحداث"""
+        import asyncio
+        from app.auth import hash_password_async, verify_password
+
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0)
+
+            task = asyncio.create_task(ticker())
+            hashed = await hash_password_async("somepassword1")
+            task.cancel()
+            return hashed, ticks
+
+        hashed, ticks = asyncio.run(run())
+        assert verify_password("somepassword1", hashed)
+        assert ticks > 1
+
+    def test_rejects_when_queue_is_full(self, monkeypatch):
+        """اختبار رفض الطلبات عند امتلاء قائمة الانتظار"""
+        import threading
+        from fastapi import HTTPException
+        from app import auth
+
+        monkeypatch.setattr(auth, "_hash_slots", threading.BoundedSemaphore(1))
+        auth._hash_slots.acquire()
+        rejected = auth.get_password_hash_stats()["rejected"]
+        with pytest.raises(HTTPException) as exc:
+            auth.hash_password("somepassword1")
+        assert exc.value.status_code == 503
+        assert auth.get_password_hash_stats()["rejected"] == rejected + 1
+
+    def test_benchmark_reports_latency(self):
+        """اختبار قياس زمن التشفير للإعدادات الحالية"""
+        from app.auth import benchmark_password_hash, get_password_hash_stats
+        result = benchmark_password_hash(samples=1)
+        assert result["avg_seconds"] > 0
+        assert get_password_hash_stats()["benchmark"] == result
+
+    def test_login_rehashes_stale_hash(self):
+        """اختبار إعادة تشفير كلمة المرور عند تسجيل الدخول بإعدادات قديمة"""
+        from passlib.context import CryptContext
+        from app.database import SessionLocal
+        from app.models import User
+        from app.auth import pwd_context
+
+        email = "rehash@example.com"
+        stale_context = CryptContext(schemes=["argon2"], argon2__rounds=1, argon2__memory_cost=1024, argon2__parallelism=1)
+        db = SessionLocal()
+        db.query(User).filter(User.email == email).delete(synchronize_session=False)
+        db.add(User(name="Rehash User", email=email, password=stale_context.hash("rehashpassword"), is_verified=True))
+        db.commit()
+
+        try:
+            response = client.post("/auth/login", data={"username": email, "password": "rehashpassword"})
+            assert response.status_code == 200
+
+            db.expire_all()
+            stored = db.query(User).filter(User.email == email).first().password
+            assert not pwd_context.needs_update(stored)
+            assert pwd_context.verify("rehashpassword", stored)
+        finally:
+            db.query(User).filter(User.email == email).delete(synchronize_session=False)
+            db.commit()
+            db.close()
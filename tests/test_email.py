@@ -0,0 +1,161 @@
+import asyncio
+import pytest
+import aiosmtplib
+from app.utils import email as email_utils
+
+
+class FakeSMTP:
+    """Stands in for aiosmtplib.SMTP and records the session lifecycle"""
+
+    instances = []
+
+    def __init__(self, **kwargs):
+        self.is_connected = False
+        self.logins = 0
+        self.sent = []
+        self.drop_next = False
+        FakeSMTP.instances.append(self)
+
+    async def connect(self):
+        self.is_connected = True
+
+    async def login(self, username, password):
+        self.logins += 1
+
+    async def send_message(self, message):
+        if self.drop_next:
+            self.drop_next = False
+            self.is_connected = False
+            raise aiosmtplib.SMTPServerDisconnected("Connection lost")
+        if message["To"].startswith("rejected"):
+            raise aiosmtplib.SMTPRecipientsRefused([])
+        self.sent.append(message["To"])
+
+    async def quit(self):
+        self.is_connected = False
+
+    def close(self):
+        self.is_connected = False
+
+
+class TestSMTPMailer:
+    """اختبارات جلسة البريد المشتركة"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        FakeSMTP.instances = []
+        monkeypatch.setattr(email_utils.aiosmtplib, "SMTP", FakeSMTP)
+        self.mailer = email_utils.SMTPMailer(email_utils.conf, idle_timeout=60)
+
+    def _messages(self, *recipients):
+        return [email_utils.build_message(r, "Subject", "<p>Hello</p>") for r in recipients]
+
+    def test_send_many_reuses_one_session(self):
+        """إرسال عدة رسائل عبر اتصال واحد وتسجيل دخول واحد"""
+        async def scenario():
+            results = await self.mailer.send_many(self._messages("a@example.com", "b@example.com"))
+            await self.mailer.send(self._messages("c@example.com")[0])
+            await self.mailer.close()
+            return results
+
+        results = asyncio.run(scenario())
+        assert results == [None, None]
+        assert len(FakeSMTP.instances) == 1
+        assert FakeSMTP.instances[0].logins == 1
+        assert FakeSMTP.instances[0].sent == ["a@example.com", "b@example.com", "c@example.com"]
+        assert FakeSMTP.instances[0].is_connected is False
+
+    def test_reconnects_when_server_drops_session(self):
+        """إعادة الاتصال وإعادة المحاولة عند انقطاع الجلسة"""
+        async def scenario():
+            await self.mailer.send_many(self._messages("a@example.com"))
+            FakeSMTP.instances[0].drop_next = True
+            return await self.mailer.send_many(self._messages("b@example.com"))
+
+        assert asyncio.run(scenario()) == [None]
+        assert len(FakeSMTP.instances) == 2
+        assert FakeSMTP.instances[1].sent == ["b@example.com"]
+        assert self.mailer.stats["reconnects"] == 1
+
+    def test_idle_session_is_replaced(self):
+        """فتح جلسة جديدة بعد تجاوز مهلة الخمول"""
+        self.mailer.idle_timeout = 0
+
+        async def scenario():
+            await self.mailer.send_many(self._messages("a@example.com"))
+            await self.mailer.send_many(self._messages("b@example.com"))
+
+        asyncio.run(scenario())
+        assert len(FakeSMTP.instances) == 2
+        assert FakeSMTP.instances[0].is_connected is False
+
+    def test_session_from_previous_loop_is_closed(self):
+        """إغلاق جلسة حلقة الأحداث السابقة قبل فتح جلسة جديدة"""
+        asyncio.run(self.mailer.send_many(self._messages("a@example.com")))
+        assert FakeSMTP.instances[0].is_connected is True
+
+        asyncio.run(self.mailer.send_many(self._messages("b@example.com")))
+        assert len(FakeSMTP.instances) == 2
+        assert FakeSMTP.instances[0].is_connected is False
+
+    def test_failed_message_does_not_stop_batch(self):
+        """فشل رسالة واحدة لا يوقف بقية الدفعة"""
+        results = asyncio.run(self.mailer.send_many(
+            self._messages("a@example.com", "rejected@example.com", "b@example.com")
+        ))
+        assert results[0] is None and results[2] is None
+        assert isinstance(results[1], aiosmtplib.SMTPRecipientsRefused)
+        assert FakeSMTP.instances[0].sent == ["a@example.com", "b@example.com"]
+        with pytest.raises(aiosmtplib.SMTPRecipientsRefused):
+            asyncio.run(self.mailer.send(self._messages("rejected@example.com")[0]))
+
+
+class TestEmailTemplates:
+    """اختبارات قوالب البريد المترجمة مسبقاً"""
+
+    def test_templates_compiled_once(self, monkeypatch):
+        """القوالب تُحلل مرة واحدة ثم تُستخدم من الذاكرة"""
+        email_utils.precompile_templates()
+        compiled = []
+        original = email_utils.template_env.compile
+        monkeypatch.setattr(email_utils.template_env, "compile", lambda *a, **k: compiled.append(a) or original(*a, **k))
+
+        html = email_utils.render_template("welcome_email_en.html", user_name="Cached User", app_url="https://sdotist.org")
+        email_utils.render_template("welcome_email_en.html", user_name="Other", app_url="https://sdotist.org")
+        assert "Cached User" in html
+        assert compiled == []
+
+    def test_templates_escape_user_values(self):
+        """القيم القادمة من المستخدم تُعرض كنص وليس HTML"""
+        for name in email_utils.EMAIL_TEMPLATES:
+            html = email_utils.render_template(
+                name, user_name="<script>alert(1)</script>", app_url="https://sdotist.org/?a=1&b=2",
+                verification_link="https://sdotist.org/verify", expiry_minutes=30,
+            )
+            assert "<script>" not in html
+            assert "&lt;script&gt;" in html
+
+    def test_privacy_page_renders_with_its_own_environment(self):
+        """صفحة الخصوصية لها بيئة قوالب مستقلة عن قوالب البريد"""
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.routers import pages
+
+        response = TestClient(app).get("/privacy-policy")
+        assert response.status_code == 200
+        assert pages.templates.env is not email_utils.template_env
+        assert "url_for" not in email_utils.template_env.globals
+
+    def test_static_page_served_from_memory(self, monkeypatch):
+        """صفحة نجاح التحقق تُقرأ من القرص مرة واحدة فقط"""
+        monkeypatch.setattr(email_utils.settings, "DEBUG", False)
+        email_utils._cached_page.cache_clear()
+        first = email_utils.static_page("verification_success.html")
+        email_utils.static_page("verification_success.html")
+        assert first
+        assert email_utils._cached_page.cache_info().misses == 1
+
+    def test_benchmark_reports_speedup(self):
+        """القياس يُظهر أن القالب المترجم أسرع من التحليل في كل مرة"""
+        result = email_utils.benchmark_template_render(samples=20)
+        assert result["cached_ms"] < result["uncached_ms"]
@@ -0,0 +1,365 @@
+import pytest
+from datetime import datetime
+from contextlib import contextmanager
+from sqlalchemy import event as sa_event
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import SessionLocal, engine, async_engine
+from app.models import User, Event, EventRegistration
+
+
+client = TestClient(app)
+
+
+@contextmanager
+def count_queries():
+    """Count SQL statements sent to the database inside the block"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = (engine, async_engine.sync_engine)
+    for target in engines:
+        sa_event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for target in engines:
+            sa_event.remove(target, "before_cursor_execute", before_cursor_execute)
+
+
+class TestEventEndpoints:
+    """اختبارات نقاط نهاية الفعاليات"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self._cleanup()
+        yield
+        self._cleanup()
+
+    def _cleanup(self):
+        db = SessionLocal()
+        event_ids = [e.id for e in db.query(Event).filter(Event.title.like("QC Event%")).all()]
+        if event_ids:
+            db.query(EventRegistration).filter(EventRegistration.event_id.in_(event_ids)).delete(synchronize_session=False)
+            db.query(Event).filter(Event.id.in_(event_ids)).delete(synchronize_session=False)
+        db.query(User).filter(User.email.like("qc_user%@example.com")).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+    def _seed(self, events: int, registrations: int, offset: int = 0) -> list[int]:
+        """Create events, each with its own registered users"""
+        db = SessionLocal()
+        event_ids = []
+        for i in range(offset, offset + events):
+            new_event = Event(title=f"QC Event {i}", date=datetime(2030, 1, 1), location="Istanbul")
+            db.add(new_event)
+            db.flush()
+            for j in range(registrations):
+                user = User(name=f"QC User {i}-{j}", email=f"qc_user{i}_{j}@example.com", password="x")
+                db.add(user)
+                db.flush()
+                db.add(EventRegistration(user_id=user.id, event_id=new_event.id))
+            event_ids.append(new_event.id)
+        db.commit()
+        db.close()
+        return event_ids
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        """Listing events issues the same number of queries regardless of size"""
+        self._seed(events=2, registrations=2)
+        with count_queries() as small:
+            response = client.get("/events/")
+        assert response.status_code == 200
+
+        self._seed(events=3, registrations=5, offset=2)
+        with count_queries() as large:
+            response = client.get("/events/")
+        assert response.status_code == 200
+
+        registrations = [r for e in response.json() if e["title"].startswith("QC Event") for r in e["registrations"]]
+        assert len(registrations) == 2 * 2 + 3 * 5
+        assert all(r["user"]["email"].startswith("qc_user") for r in registrations)
+        assert len(large) == len(small)
+        assert len(large) <= 3
+
+    def test_detail_uses_single_query(self):
+        """Event details load registrations and users in one round trip"""
+        event_id = self._seed(events=1, registrations=4)[0]
+        with count_queries() as statements:
+            response = client.get(f"/events/{event_id}")
+        assert response.status_code == 200
+        assert len(response.json()["registrations"]) == 4
+        assert len(statements) == 1
+
+    def test_summary_returns_counts_in_single_query(self):
+        """Summary view aggregates registrations without embedding the roster"""
+        event_id = self._seed(events=1, registrations=3)[0]
+        db = SessionLocal()
+        registration = db.query(EventRegistration).filter(EventRegistration.event_id == event_id).first()
+        registration.attended = True
+        db.commit()
+        db.close()
+        empty_id = self._seed(events=1, registrations=0, offset=1)[0]
+
+        with count_queries() as statements:
+            response = client.get("/events/summary")
+        assert response.status_code == 200
+        assert len(statements) == 1
+
+        summaries = {e["id"]: e for e in response.json()}
+        assert summaries[event_id]["registration_count"] == 3
+        assert summaries[event_id]["attended_count"] == 1
+        assert summaries[empty_id]["registration_count"] == 0
+        assert summaries[empty_id]["attended_count"] == 0
+        assert "registrations" not in summaries[event_id]
+
+    def test_cursor_pagination_walks_all_events(self):
+        """Following X-Next-Cursor visits every event once, in the same order as skip/limit"""
+        self._seed(events=5, registrations=0)
+        expected = [e["id"] for e in client.get("/events/", params={"limit": 1000}).json()]
+
+        seen = []
+        params = {"limit": 2}
+        while True:
+            response = client.get("/events/", params=params)
+            assert response.status_code == 200
+            seen.extend(e["id"] for e in response.json())
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if not next_cursor:
+                break
+            params = {"limit": 2, "cursor": next_cursor}
+
+        assert seen == expected
+        legacy = client.get("/events/", params={"skip": 2, "limit": 2}).json()
+        assert [e["id"] for e in legacy] == expected[2:4]
+
+    def test_invalid_cursor_rejected(self):
+        """Malformed cursors return 400"""
+        response = client.get("/events/", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+
+    def test_cursor_values_must_match_column_types(self):
+        """A cursor whose id is not an integer is rejected before reaching the database"""
+        from app.pagination import encode_cursor
+        for values in (["2030-01-01T00:00:00", "abc"], ["2030-01-01T00:00:00", True], [123, 1]):
+            response = client.get("/events/", params={"cursor": encode_cursor(values)})
+            assert response.status_code == 400
+
+    def test_zero_limit_returns_no_rows(self):
+        """limit=0 returns an empty page"""
+        self._seed(events=2, registrations=0)
+        response = client.get("/events/", params={"limit": 0})
+        assert response.status_code == 200
+        assert response.json() == []
+
+    def test_authenticated_request_uses_one_connection(self):
+        """Auth dependency and handler share a single pooled connection"""
+        from app.auth import create_access_token
+        event_id = self._seed(events=1, registrations=2)[0]
+        db = SessionLocal()
+        db.add(User(name="QC Admin", email="qc_user_admin@example.com", password="x", role="admin"))
+        db.commit()
+        db.close()
+        token = create_access_token({"sub": "qc_user_admin@example.com", "role": "admin"})
+
+        checked_out = {"current": 0, "peak": 0}
+
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            checked_out["current"] += 1
+            checked_out["peak"] = max(checked_out["peak"], checked_out["current"])
+
+        def on_checkin(dbapi_connection, connection_record):
+            checked_out["current"] -= 1
+
+        sa_event.listen(engine, "checkout", on_checkout)
+        sa_event.listen(engine, "checkin", on_checkin)
+        try:
+            response = client.get(
+                f"/events/{event_id}/registrations",
+                headers={"Authorization": f"Bearer {token}"},
+            )
+        finally:
+            sa_event.remove(engine, "checkout", on_checkout)
+            sa_event.remove(engine, "checkin", on_checkin)
+
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+        assert checked_out["peak"] == 1
+
+
+class CheckInFixture:
+    """An event with three registered users (one already attended) and one outsider"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        from app.auth import create_access_token
+        self._cleanup()
+        db = SessionLocal()
+        new_event = Event(title="CheckIn Event", date=datetime(2030, 1, 1), location="Istanbul")
+        db.add(new_event)
+        db.add(User(name="CheckIn Admin", email="checkin_admin@example.com", password="x", role="admin", is_verified=True))
+        db.flush()
+        self.event_id = new_event.id
+        self.barcodes = {}
+        for name in ("a", "b", "c", "outsider"):
+            user = User(name=f"CheckIn {name}", email=f"checkin_{name}@example.com", password="x", barcode_id=f"checkin-{name}")
+            db.add(user)
+            db.flush()
+            self.barcodes[name] = user.barcode_id
+            if name != "outsider":
+                db.add(EventRegistration(user_id=user.id, event_id=new_event.id, attended=(name == "c")))
+        db.commit()
+        db.close()
+        self.headers = {"Authorization": f"Bearer {create_access_token({'sub': 'checkin_admin@example.com', 'role': 'admin'})}"}
+        yield
+        self._cleanup()
+
+    def _cleanup(self):
+        db = SessionLocal()
+        event_ids = [e.id for e in db.query(Event).filter(Event.title == "CheckIn Event").all()]
+        if event_ids:
+            db.query(EventRegistration).filter(EventRegistration.event_id.in_(event_ids)).delete(synchronize_session=False)
+            db.query(Event).filter(Event.id.in_(event_ids)).delete(synchronize_session=False)
+        db.query(User).filter(User.email.like("checkin_%@example.com")).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+
+
+class TestBatchCheckIn(CheckInFixture):
+    """اختبارات تسجيل الحضور الجماعي لأجهزة المسح"""
+
+    def _check_in(self, scans):
+        return client.post(f"/events/{self.event_id}/check-in", json={"scans": scans}, headers=self.headers)
+
+    def test_batch_statuses_in_one_select_and_one_update(self):
+        """دفعة كاملة تُعالج باستعلام قراءة واحد وتحديث واحد"""
+        scans = [
+            {"barcode_id": self.barcodes["a"], "scanned_at": "2025-01-01T09:00:00Z"},
+            {"barcode_id": self.barcodes["b"]},
+            {"barcode_id": self.barcodes["c"]},
+            {"barcode_id": self.barcodes["outsider"]},
+            {"barcode_id": "no-such-barcode"},
+            {"barcode_id": self.barcodes["a"], "scanned_at": "2025-01-01T09:05:00Z"},
+        ]
+        with count_queries() as statements:
+            response = self._check_in(scans)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["checked_in"] == 2
+        assert [r["status"] for r in data["results"]] == [
+            "checked_in", "checked_in", "already_checked_in", "not_registered", "unknown_barcode", "duplicate",
+        ]
+        assert data["results"][0]["name"] == "CheckIn a"
+        assert data["results"][0]["attended_at"].startswith("2025-01-01T09:00:00")
+        assert len([s for s in statements if s.startswith("UPDATE event_registrations")]) == 1
+        assert len([s for s in statements if "FROM users LEFT OUTER JOIN event_registrations" in s]) == 1
+
+        db = SessionLocal()
+        registration = db.query(EventRegistration).join(User).filter(User.barcode_id == self.barcodes["a"]).one()
+        assert registration.attended is True
+        assert registration.attended_at.replace(tzinfo=None) == datetime(2025, 1, 1, 9, 0)
+        db.close()
+
+    def test_rescan_is_idempotent(self):
+        """إعادة إرسال الدفعة نفسها لا تغير وقت الحضور"""
+        scans = [{"barcode_id": self.barcodes["a"], "scanned_at": "2025-01-01T09:00:00Z"}]
+        assert self._check_in(scans).json()["checked_in"] == 1
+        retry = self._check_in([{"barcode_id": self.barcodes["a"], "scanned_at": "2025-01-01T10:00:00Z"}]).json()
+        assert retry["checked_in"] == 0
+        assert retry["results"][0]["status"] == "already_checked_in"
+        assert retry["results"][0]["attended_at"].startswith("2025-01-01T09:00:00")
+
+    def test_future_scan_time_is_clamped(self):
+        """وقت مسح في المستقبل (ساعة جهاز خاطئة) يُستبدل بالوقت الحالي"""
+        data = self._check_in([{"barcode_id": self.barcodes["b"], "scanned_at": "2099-01-01T00:00:00Z"}]).json()
+        assert data["results"][0]["status"] == "checked_in"
+        assert not data["results"][0]["attended_at"].startswith("2099")
+
+    def test_unknown_event_returns_404(self):
+        """فعالية غير موجودة تعيد 404 بدلاً من نتائج not_registered"""
+        response = client.post(
+            "/events/999999/check-in", json={"scans": [{"barcode_id": self.barcodes["a"]}]}, headers=self.headers
+        )
+        assert response.status_code == 404
+
+    def test_requires_admin(self):
+        """أجهزة المسح تعمل بحساب مسؤول فقط"""
+        from app.auth import create_access_token
+        token = create_access_token({"sub": "checkin_a@example.com", "role": "user"})
+        response = client.post(
+            f"/events/{self.event_id}/check-in",
+            json={"scans": [{"barcode_id": self.barcodes["a"]}]},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code in (401, 403)
+
+
+class TestCheckInManifest(CheckInFixture):
+    """اختبارات قائمة الحضور الموقعة للمسح دون اتصال"""
+
+    def _manifest(self, headers=None):
+        return client.get(f"/events/{self.event_id}/check-in/manifest", headers=headers or self.headers)
+
+    def test_manifest_is_signed_and_maps_barcode_hashes(self):
+        """القائمة موقعة وتربط بصمة الباركود بالتسجيل والاسم"""
+        import base64
+        import hashlib
+        import json
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+        from app.utils.manifests import barcode_hash
+
+        with count_queries() as statements:
+            response = self._manifest()
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        body = response.content
+        lines = body.splitlines(keepends=True)
+        header, entries, trailer = json.loads(lines[0]), [json.loads(l) for l in lines[1:-1]], json.loads(lines[-1])
+
+        assert header["event_id"] == self.event_id
+        assert trailer["count"] == len(entries) == 3
+
+        # Verified with the published public key only, as a scanner would
+        published = client.get("/events/check-in/public-key").json()
+        assert published["algorithm"] == trailer["algorithm"] == "Ed25519"
+        assert published["key_id"] == header["key_id"]
+        public_key = Ed25519PublicKey.from_public_bytes(base64.b64decode(published["public_key"]))
+        signed = hashlib.sha256(b"".join(lines[:-1])).digest()
+        public_key.verify(base64.b64decode(trailer["signature"]), signed)
+
+        by_hash = {e["h"]: e for e in entries}
+        entry = by_hash[barcode_hash(self.event_id, self.barcodes["a"])]
+        assert entry["n"] == "CheckIn a" and entry["a"] is False
+        assert by_hash[barcode_hash(self.event_id, self.barcodes["c"])]["a"] is True
+        assert barcode_hash(self.event_id, self.barcodes["outsider"]) not in by_hash
+        assert self.barcodes["a"] not in body.decode()
+        # Every registration comes from one query
+        assert len([s for s in statements if "FROM event_registrations" in s]) == 1
+
+    def test_tampered_manifest_fails_verification(self):
+        """أي تعديل على القائمة يبطل التوقيع"""
+        import base64
+        import hashlib
+        import json
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+        lines = self._manifest().content.splitlines(keepends=True)
+        trailer = json.loads(lines[-1])
+        lines[1] = lines[1].replace(b'"a":false', b'"a":true')
+        public_key = Ed25519PublicKey.from_public_bytes(
+            base64.b64decode(client.get("/events/check-in/public-key").json()["public_key"])
+        )
+        with pytest.raises(InvalidSignature):
+            public_key.verify(base64.b64decode(trailer["signature"]), hashlib.sha256(b"".join(lines[:-1])).digest())
+
+    def test_manifest_requires_admin_and_existing_event(self):
+        """القائمة للمسؤولين فقط ولفعالية موجودة"""
+        from app.auth import create_access_token
+        token = create_access_token({"sub": "checkin_a@example.com", "role": "user"})
+        assert self._manifest({"Authorization": f"Bearer {token}"}).status_code in (401, 403)
+        response = client.get("/events/999999/check-in/manifest", headers=self.headers)
+        assert response.status_code == 404
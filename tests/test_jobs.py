@@ -0,0 +1,146 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from app import jobs
+from app.database import SessionLocal
+from app.models import OutboundJob
+
+
+class TestOutboundJobs:
+    """اختبارات قائمة المهام الخارجية (البريد والإشعارات)"""
+
+    # Own job kind, so the shared test database's other jobs are neither run nor deleted
+    kind = "test.welcome"
+
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        self._cleanup()
+        self.calls = []
+
+        async def fake_email(email, name, **kwargs):
+            self.calls.append(email)
+            if email.startswith("broken"):
+                raise RuntimeError("SMTP unavailable")
+
+        monkeypatch.setitem(jobs.JOB_HANDLERS, self.kind, fake_email)
+        monkeypatch.setattr(jobs.settings, "JOB_MAX_ATTEMPTS", 2)
+        monkeypatch.setattr(jobs.settings, "JOB_RETRY_BASE_SECONDS", 0)
+        yield
+        self._cleanup()
+
+    def _cleanup(self):
+        db = SessionLocal()
+        db.query(OutboundJob).filter(OutboundJob.kind == self.kind).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+    def _enqueue(self, email):
+        db = SessionLocal()
+        job = jobs.enqueue(db, self.kind, email=email, name="Job User")
+        db.commit()
+        job_id = job.id
+        db.close()
+        return job_id
+
+    def _job(self, job_id):
+        db = SessionLocal()
+        job = db.get(OutboundJob, job_id)
+        db.close()
+        return job
+
+    def test_successful_job_is_marked_done(self):
+        """اختبار تنفيذ المهمة وتسجيل نجاحها"""
+        job_id = self._enqueue("jobuser@example.com")
+        assert asyncio.run(jobs.run_pending_jobs(kinds=[self.kind])) == 1
+
+        job = self._job(job_id)
+        assert self.calls == ["jobuser@example.com"]
+        assert job.status == "done"
+        assert job.attempts == 1
+        assert job.finished_at is not None
+        assert asyncio.run(jobs.run_pending_jobs(kinds=[self.kind])) == 0
+
+    def test_failed_job_retries_then_gives_up(self):
+        """اختبار إعادة المحاولة ثم الفشل النهائي"""
+        job_id = self._enqueue("broken@example.com")
+
+        asyncio.run(jobs.run_pending_jobs(kinds=[self.kind]))
+        job = self._job(job_id)
+        assert job.status == "pending"
+        assert job.attempts == 1
+        assert "SMTP unavailable" in job.last_error
+
+        asyncio.run(jobs.run_pending_jobs(kinds=[self.kind]))
+        job = self._job(job_id)
+        assert job.status == "failed"
+        assert job.attempts == 2
+        assert asyncio.run(jobs.run_pending_jobs(kinds=[self.kind])) == 0
+
+    def test_failed_job_keeps_resume_point(self, monkeypatch):
+        """اختبار حفظ نقطة الاستئناف في بيانات المهمة عند الفشل الجزئي"""
+        class Interrupted(Exception):
+            resume_payload = {"after_id": 42}
+
+        async def partial(**payload):
+            raise Interrupted("half sent")
+
+        monkeypatch.setitem(jobs.JOB_HANDLERS, self.kind, partial)
+        job_id = self._enqueue("partial@example.com")
+        asyncio.run(jobs.run_pending_jobs(kinds=[self.kind]))
+
+        job = self._job(job_id)
+        assert job.status == "pending"
+        assert job.payload == {"email": "partial@example.com", "name": "Job User", "after_id": 42}
+
+    def test_long_job_is_not_reclaimed(self, monkeypatch):
+        """اختبار تجديد قفل المهمة الطويلة حتى لا ينفذها عامل آخر مرة ثانية"""
+        monkeypatch.setattr(jobs.settings, "JOB_LOCK_TIMEOUT_SECONDS", 0.3)
+        reclaimed = []
+
+        async def slow(**payload):
+            await asyncio.sleep(0.5)
+            async with jobs.AsyncSessionLocal() as db:
+                reclaimed.extend(await jobs.claim_jobs(db, 10, [self.kind]))
+
+        monkeypatch.setitem(jobs.JOB_HANDLERS, self.kind, slow)
+        job_id = self._enqueue("slow@example.com")
+        asyncio.run(jobs.run_pending_jobs(kinds=[self.kind]))
+
+        assert reclaimed == []
+        assert self._job(job_id).status == "done"
+
+    def test_future_jobs_are_not_claimed(self):
+        """اختبار عدم تنفيذ المهام المؤجلة قبل موعدها"""
+        db = SessionLocal()
+        job = jobs.enqueue(db, self.kind, email="later@example.com", name="Job User")
+        job.run_after = datetime(2999, 1, 1)
+        db.commit()
+        db.close()
+
+        assert asyncio.run(jobs.run_pending_jobs(kinds=[self.kind])) == 0
+        assert self.calls == []
+
+    def test_old_done_jobs_are_purged(self):
+        """اختبار حذف المهام المنتهية القديمة فقط"""
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        old_done = jobs.enqueue(db, self.kind, email="old@example.com", name="Job User")
+        old_done.status, old_done.finished_at = "done", now - timedelta(days=30)
+        old_failed = jobs.enqueue(db, self.kind, email="failed@example.com", name="Job User")
+        old_failed.status, old_failed.finished_at = "failed", now - timedelta(days=30)
+        recent_done = jobs.enqueue(db, self.kind, email="recent@example.com", name="Job User")
+        recent_done.status, recent_done.finished_at = "done", now
+        db.commit()
+        ids = old_done.id, old_failed.id, recent_done.id
+        db.close()
+
+        asyncio.run(jobs.purge_finished_jobs())
+
+        assert [self._job(job_id) is None for job_id in ids] == [True, False, False]
+
+    def test_unknown_kind_rejected(self):
+        """اختبار رفض أنواع المهام غير المعروفة"""
+        db = SessionLocal()
+        with pytest.raises(ValueError):
+            jobs.enqueue(db, "email.unknown", email="x@example.com")
+        db.close()
@@ -88,3 +88,46 @@ class TestNewsEndpoints:
         response = self.client.get(f"/news/{news_id}")
         assert response.status_code == 200
         assert response.json()["title"] == "Public News"
+
+
+class TestNewsCursorPagination:
+    """Paging rows whose created_at comes from the database default"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        from app.database import SessionLocal
+        from app.models import News
+        self._cleanup()
+        db = SessionLocal()
+        # No created_at: the server default fills it, all within the same second
+        db.add_all([News(title="Cursor News", body=f"body {i}") for i in range(5)])
+        db.commit()
+        self.ids = sorted((n.id for n in db.query(News).filter(News.title == "Cursor News")), reverse=True)
+        db.close()
+        yield
+        self._cleanup()
+
+    def _cleanup(self):
+        from app.database import SessionLocal
+        from app.models import News
+        db = SessionLocal()
+        db.query(News).filter(News.title == "Cursor News").delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+    def test_cursor_walks_server_default_timestamps(self):
+        """Following X-Next-Cursor visits every row once and terminates"""
+        client = TestClient(app)
+        seen = []
+        params = {"limit": 2}
+        for _ in range(10):
+            response = client.get("/news/", params=params)
+            assert response.status_code == 200
+            seen.extend(n["id"] for n in response.json() if n["title"] == "Cursor News")
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if not next_cursor:
+                break
+            params = {"limit": 2, "cursor": next_cursor}
+        else:
+            pytest.fail("pagination did not terminate")
+        assert seen == self.ids
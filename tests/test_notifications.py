@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from firebase_admin import exceptions, messaging
+from app import firebase, push
+from app.database import SessionLocal
+from app.models import User, DeviceToken
+from app.auth import create_access_token
+from fastapi.testclient import TestClient
+from app.main import app
+
+
+client = TestClient(app)
+
+
+class TestBroadcastPush:
+    """اختبارات إرسال الإشعارات لجميع الأجهزة"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        self._cleanup()
+        db = SessionLocal()
+        for i in range(7):
+            token = f"dead-token-{i}" if i in (2, 5) else f"live-token-{i}"
+            user = User(name=f"Push User {i}", email=f"pushuser{i}@example.com", password="x")
+            user.device_tokens.append(DeviceToken(token=token, platform="android"))
+            db.add(user)
+        db.commit()
+        db.close()
+
+        self.batches = []
+
+        self.unavailable = set()
+
+        async def fake_send(message):
+            self.batches.append(list(message.tokens))
+            if self.unavailable & set(message.tokens):
+                raise exceptions.UnavailableError("FCM is down")
+            responses = [
+                SimpleNamespace(success=False, exception=messaging.UnregisteredError("gone"))
+                if token.startswith("dead-") else SimpleNamespace(success=True, exception=None)
+                for token in message.tokens
+            ]
+            succeeded = sum(r.success for r in responses)
+            return SimpleNamespace(responses=responses, success_count=succeeded, failure_count=len(responses) - succeeded)
+
+        monkeypatch.setattr(firebase, "_firebase_app", object())
+        monkeypatch.setattr(messaging, "send_each_for_multicast_async", fake_send)
+        yield
+        self._cleanup()
+
+    def _cleanup(self):
+        db = SessionLocal()
+        db.query(DeviceToken).filter(DeviceToken.token.like("%-token-%")).delete(synchronize_session=False)
+        db.query(User).filter(User.email.like("pushuser%@example.com")).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+    def test_broadcast_sends_in_batches_and_prunes_dead_tokens(self):
+        """اختبار التقسيم إلى دفعات وحذف الـ Tokens غير الصالحة"""
+        result = asyncio.run(push.broadcast_push("Title", "Body", batch_size=3))
+
+        assert [len(b) for b in self.batches] == [3, 3, 1]
+        assert result["success_count"] == 5
+        assert result["failure_count"] == 2
+        assert sorted(result["invalid_tokens"]) == ["dead-token-2", "dead-token-5"]
+
+        db = SessionLocal()
+        tokens = {t.token for t in db.query(DeviceToken).filter(DeviceToken.token.like("%-token-%")).all()}
+        db.close()
+        assert "dead-token-2" not in tokens
+        assert "dead-token-5" not in tokens
+        assert "live-token-0" in tokens
+
+    def test_batch_size_capped_at_fcm_limit(self):
+        """اختبار عدم تجاوز حد FCM لكل دفعة"""
+        asyncio.run(push.broadcast_push("Title", "Body", batch_size=10_000))
+        assert all(len(b) <= firebase.FCM_BATCH_SIZE for b in self.batches)
+
+    def test_retryable_error_resumes_after_last_sent_batch(self, monkeypatch):
+        """اختبار إعادة المحاولة من آخر دفعة تم إرسالها بدلاً من البداية"""
+        monkeypatch.setattr(push.settings, "FCM_MAX_PARALLEL_BATCHES", 1)
+        self.unavailable = {"live-token-3"}
+        with pytest.raises(push.BroadcastInterrupted) as interrupted:
+            asyncio.run(push.broadcast_push("Title", "Body", batch_size=3))
+        assert [len(b) for b in self.batches] == [3, 3]
+
+        # The failed batch is sent again; the first one is not
+        self.batches, self.unavailable = [], set()
+        result = asyncio.run(push.broadcast_push("Title", "Body", batch_size=3, **interrupted.value.resume_payload))
+        assert self.batches == [["live-token-3", "live-token-4", "dead-token-5"], ["live-token-6"]]
+        assert result["success_count"] == 3
+
+    def test_register_token_keeps_one_row_per_device(self):
+        """اختبار تسجيل أكثر من جهاز لنفس المستخدم وتحديث الجهاز المكرر"""
+        db = SessionLocal()
+        user = db.query(User).filter(User.email == "pushuser0@example.com").first()
+        other = db.query(User).filter(User.email == "pushuser1@example.com").first()
+        user_id, other_id = user.id, other.id
+        db.close()
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'pushuser0@example.com', 'role': 'user', 'uid': user_id, 'ver': 0})}"}
+
+        assert client.post("/notifications/register-token", json={"token": "web-token-0", "platform": "web"}, headers=headers).status_code == 200
+        assert client.post("/notifications/register-token", json={"token": "web-token-0"}, headers=headers).status_code == 200
+        # A token previously registered by another account moves to this user
+        assert client.post("/notifications/register-token", json={"token": "live-token-1"}, headers=headers).status_code == 200
+
+        db = SessionLocal()
+        rows = {t.token: t for t in db.query(DeviceToken).filter(DeviceToken.user_id == user_id).all()}
+        other_tokens = db.query(DeviceToken).filter(DeviceToken.user_id == other_id).count()
+        db.close()
+        assert set(rows) == {"live-token-0", "web-token-0", "live-token-1"}
+        assert rows["web-token-0"].platform == "web"
+        assert other_tokens == 0
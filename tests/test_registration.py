@@ -1,5 +1,6 @@
 import pytest
 import io
+from datetime import datetime
 from fastapi.testclient import TestClient
 from app.main import app
 from app.database import SessionLocal
@@ -75,6 +76,49 @@ class TestRegistrationWithDocument:
         assert data["status"] == "pending"
         assert "under review" in data["message"].lower()
 
+    def _stored_documents(self):
+        import os
+        from app.storage import get_storage
+        folder = os.path.join(get_storage().root, "documents")
+        return set(os.listdir(folder)) if os.path.isdir(folder) else set()
+
+    def _register(self, email):
+        return client.post(
+            "/register",
+            data={"name": "Test Student", "email": email, "password": "testpassword123"},
+            files={"document": ("student_id.png", self._create_test_image(), "image/png")},
+        )
+
+    def test_busy_hasher_stores_no_document(self, monkeypatch):
+        """لا يُحفظ المستند إذا رفض الخادم حساب كلمة المرور"""
+        from fastapi import HTTPException
+        from app.routers import registration
+
+        async def busy(password):
+            raise HTTPException(status_code=503, detail="Server busy")
+
+        monkeypatch.setattr(registration, "hash_password_async", busy)
+        before = self._stored_documents()
+        assert self._register("testdoc_busy@example.com").status_code == 503
+        assert self._stored_documents() == before
+
+    def test_failed_save_deletes_document(self, monkeypatch):
+        """حذف المستند المحفوظ إذا لم يُحفظ الحساب"""
+        from app.routers import registration
+
+        def broken_enqueue(db, kind, **payload):
+            raise RuntimeError("database unavailable")
+
+        monkeypatch.setattr(registration, "enqueue", broken_enqueue)
+        before = self._stored_documents()
+        with pytest.raises(RuntimeError):
+            self._register("testdoc_failed@example.com")
+        assert self._stored_documents() == before
+
+        db = SessionLocal()
+        assert db.query(User).filter(User.email == "testdoc_failed@example.com").count() == 0
+        db.close()
+
     def test_register_with_invalid_file_type(self):
         """Test registration with unsupported file type"""
         test_file = io.BytesIO(b"fake executable content")
@@ -224,3 +268,194 @@ class TestRegistrationWithDocument:
         )
         assert response.status_code == 400
         assert "already registered" in response.json()["detail"].lower()
+
+
+class TestBulkRegistrationActions:
+    """اختبارات القبول والرفض الجماعي للتسجيلات"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        from app.auth import create_access_token
+        self._cleanup()
+        db = SessionLocal()
+        db.add(User(name="Bulk Admin", email="bulk_admin@example.com", password="x", role="admin", is_verified=True))
+        self.document = tmp_path / "document.pdf"
+        self.document.write_bytes(b"%PDF")
+        for i in range(3):
+            db.add(User(
+                name=f"Bulk Pending {i}", email=f"bulk_pending{i}@example.com", password="x",
+                status="pending", document_path=str(self.document) if i == 0 else None
+            ))
+        db.add(User(name="Bulk Active", email="bulk_active@example.com", password="x", status="active"))
+        db.commit()
+        self.ids = {u.email: u.id for u in db.query(User).filter(User.email.like("bulk_%@example.com")).all()}
+        db.close()
+        token = create_access_token({"sub": "bulk_admin@example.com", "role": "admin"})
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.first_job_id = self._last_job_id() + 1
+        yield
+        self._cleanup()
+
+    def _last_job_id(self) -> int:
+        from sqlalchemy import func
+        from app.models import OutboundJob
+        db = SessionLocal()
+        last = db.query(func.max(OutboundJob.id)).scalar() or 0
+        db.close()
+        return last
+
+    def _cleanup(self):
+        from app.models import Notification, OutboundJob
+        db = SessionLocal()
+        user_ids = [u.id for u in db.query(User).filter(User.email.like("bulk_%@example.com")).all()]
+        db.query(Notification).filter(Notification.recipient_id.in_(user_ids)).delete(synchronize_session=False)
+        db.query(User).filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+        # Only the jobs this test's requests created
+        if hasattr(self, "first_job_id"):
+            db.query(OutboundJob).filter(OutboundJob.id >= self.first_job_id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+    def test_bulk_approve(self):
+        """قبول عدة مستخدمين مع نتيجة لكل معرف"""
+        from app.models import Notification, OutboundJob
+        from tests.test_events import count_queries
+        pending = [self.ids[f"bulk_pending{i}@example.com"] for i in range(3)]
+        user_ids = pending + [self.ids["bulk_active@example.com"], 999999]
+
+        with count_queries() as statements:
+            response = client.post("/admin/registrations/approve", json={"user_ids": user_ids}, headers=self.headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["approved"] == 3
+        assert [r["status"] for r in data["results"]] == ["approved"] * 3 + ["not_pending", "not_found"]
+        # One UPDATE and one INSERT per table, regardless of batch size
+        # (the second job insert is the single document clean-up job)
+        assert len([s for s in statements if s.startswith("INSERT INTO notifications")]) == 1
+        assert len([s for s in statements if s.startswith("INSERT INTO outbound_jobs")]) == 2
+        assert len([s for s in statements if s.startswith("UPDATE users")]) == 1
+
+        db = SessionLocal()
+        assert {u.status for u in db.query(User).filter(User.id.in_(pending))} == {"active"}
+        assert db.query(Notification).filter(Notification.recipient_id.in_(pending)).count() == 3
+        jobs = db.query(OutboundJob).filter(OutboundJob.id >= self.first_job_id).all()
+        assert sorted(j.kind for j in jobs) == ["email.approval"] * 3 + ["storage.delete"]
+        assert next(j for j in jobs if j.kind == "storage.delete").payload == {"keys": [str(self.document)]}
+        db.close()
+        # The document is removed by the job worker, not the request
+        assert self.document.exists()
+
+        again = client.post("/admin/registrations/approve", json={"user_ids": pending[:1]}, headers=self.headers)
+        assert again.json()["results"] == [{"user_id": pending[0], "status": "not_pending"}]
+
+    def test_bulk_reject(self):
+        """رفض عدة مستخدمين وحذفهم"""
+        pending = [self.ids[f"bulk_pending{i}@example.com"] for i in range(2)]
+        user_ids = pending + [self.ids["bulk_active@example.com"]]
+
+        response = client.post("/admin/registrations/reject", json={"user_ids": user_ids}, headers=self.headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["rejected"] == 2
+        assert [r["status"] for r in data["results"]] == ["rejected", "rejected", "not_pending"]
+
+        db = SessionLocal()
+        assert db.query(User).filter(User.id.in_(pending)).count() == 0
+        assert db.query(User).filter(User.id == self.ids["bulk_active@example.com"]).count() == 1
+        db.close()
+
+    def test_bulk_requires_admin(self):
+        """المستخدم العادي لا يمكنه تنفيذ الإجراءات الجماعية"""
+        response = client.post("/admin/registrations/approve", json={"user_ids": [1]})
+        assert response.status_code == 401
+
+
+class TestPendingRegistrationsQueue:
+    """اختبارات قائمة التسجيلات المعلقة"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        from app.auth import create_access_token
+        self._cleanup()
+        db = SessionLocal()
+        db.add(User(name="Queue Admin", email="queue_admin@example.com", password="x", role="admin", is_verified=True))
+        for i in range(5):
+            db.add(User(
+                name=f"Queue Pending {i}", email=f"queue_pending{i}@example.com", password="secret-hash",
+                status="pending", university="Queue University", degree="master" if i % 2 else "bachelor",
+                document_path=f"app/static/documents/doc{i}.pdf", created_at=datetime(2030, 1, 1 + i, 9, 30)
+            ))
+        db.add(User(name="Queue Active", email="queue_active@example.com", password="x", university="Queue University"))
+        db.commit()
+        db.close()
+        token = create_access_token({"sub": "queue_admin@example.com", "role": "admin"})
+        self.headers = {"Authorization": f"Bearer {token}"}
+        yield
+        self._cleanup()
+
+    def _cleanup(self):
+        db = SessionLocal()
+        db.query(User).filter(User.email.like("queue_%@example.com")).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+    def _get(self, **params):
+        params.setdefault("university", "Queue University")
+        return client.get("/admin/pending-registrations", params=params, headers=self.headers)
+
+    def test_cursor_walks_server_default_timestamps(self):
+        """التسجيلات التي يضع الخادم وقت إنشائها تُعرض كلها بالترتيب دون تكرار"""
+        db = SessionLocal()
+        for i in range(3):
+            db.add(User(
+                name=f"Queue Default {i}", email=f"queue_default{i}@example.com", password="x",
+                status="pending", university="Default University"
+            ))
+        db.commit()
+        expected = [u.id for u in db.query(User).filter(User.email.like("queue_default%@example.com")).order_by(User.id)]
+        db.close()
+
+        seen = []
+        params = {"limit": 2, "university": "Default University"}
+        for _ in range(10):
+            response = client.get("/admin/pending-registrations", params=params, headers=self.headers)
+            assert response.status_code == 200
+            seen.extend(u["id"] for u in response.json())
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if not next_cursor:
+                break
+            params = {**params, "cursor": next_cursor}
+        else:
+            pytest.fail("pagination did not terminate")
+        assert seen == expected
+
+    def test_queue_is_paginated_oldest_first(self):
+        """التصفح بالـ cursor يمر على كل التسجيلات المعلقة بالترتيب"""
+        seen = []
+        params = {"limit": 2}
+        while True:
+            response = self._get(**params)
+            assert response.status_code == 200
+            seen.extend(u["email"] for u in response.json())
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if not next_cursor:
+                break
+            params = {"limit": 2, "cursor": next_cursor}
+        assert seen == [f"queue_pending{i}@example.com" for i in range(5)]
+
+    def test_queue_filters_and_projection(self):
+        """التصفية حسب الدرجة وعدم إرجاع كلمة المرور"""
+        from tests.test_events import count_queries
+        with count_queries() as statements:
+            response = self._get(degree="master")
+        users = response.json()
+        assert [u["email"] for u in users] == ["queue_pending1@example.com", "queue_pending3@example.com"]
+        # Local storage hands out signed, expiring links for private documents
+        assert users[0]["document_url"].startswith("https://api.sdotist.org/static/documents/doc1.pdf?expires=")
+        assert "&signature=" in users[0]["document_url"]
+        assert "password" not in users[0]
+        query = next(s for s in statements if "FROM users" in s and "WHERE users.status" in s)
+        assert "users.password" not in query
+
+        window = self._get(created_from="2030-01-02T00:00:00", created_to="2030-01-04T00:00:00").json()
+        assert [u["email"] for u in window] == ["queue_pending1@example.com", "queue_pending2@example.com"]
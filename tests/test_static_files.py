@@ -0,0 +1,98 @@
+import gzip
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from app.static_files import CachedStaticFiles, precompress_assets
+
+CONTENT_HASH = "ab" * 32
+UUID_NAME = "f314893e-4417-408f-b182-3658dc8303bf.jpg"
+
+
+class TestCachedStaticFiles:
+    """اختبارات خدمة الملفات الثابتة مع التخزين المؤقت"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        for directory in ("uploads", "documents"):
+            (tmp_path / directory).mkdir()
+        (tmp_path / "uploads" / f"{CONTENT_HASH}.webp").write_bytes(b"0123456789" * 10)
+        (tmp_path / "uploads" / UUID_NAME).write_bytes(b"jpeg")
+        (tmp_path / UUID_NAME).write_bytes(b"jpeg")
+        (tmp_path / "documents" / UUID_NAME).write_bytes(b"student id")
+        (tmp_path / "app.js").write_text("console.log('hello');" * 20)
+        self.directory = tmp_path
+        app = Starlette(routes=[Mount("/static", CachedStaticFiles(directory=str(tmp_path)))])
+        self.client = TestClient(app)
+
+    def test_content_addressed_file_is_immutable_with_strong_etag(self):
+        """الملفات المسماة بالـ hash: cache دائم و ETag قوي و 304"""
+        response = self.client.get(f"/static/uploads/{CONTENT_HASH}.webp")
+        assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+        assert response.headers["etag"] == f'"{CONTENT_HASH}"'
+
+        cached = self.client.get(f"/static/uploads/{CONTENT_HASH}.webp", headers={"If-None-Match": f'"{CONTENT_HASH}"'})
+        assert cached.status_code == 304
+        assert cached.headers["cache-control"] == "public, max-age=31536000, immutable"
+
+    def test_uuid_named_file_is_immutable(self):
+        """ملفات الـ uuid القديمة لا تتغير أيضاً"""
+        response = self.client.get(f"/static/uploads/{UUID_NAME}")
+        assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+
+    def test_immutable_only_under_upload_prefixes(self):
+        """الأسماء الثابتة خارج uploads/ و profiles/ تُعاد مراجعتها"""
+        response = self.client.get(f"/static/{UUID_NAME}")
+        assert response.headers["cache-control"] == "public, no-cache"
+
+    def test_documents_need_signed_url_and_are_not_cached(self):
+        """الوثائق الخاصة تُخدم فقط برابط موقع ولا تُخزن مؤقتاً"""
+        from app.static_files import sign_private_key
+        key = f"documents/{UUID_NAME}"
+        assert self.client.get(f"/static/{key}").status_code == 404
+        assert self.client.get(f"/static/{key}?expires=9999999999&signature=forged").status_code == 404
+        assert self.client.get(f"/static/uploads/../{key}").status_code == 404
+
+        response = self.client.get(f"/static/{key}?{sign_private_key(key, 60)}")
+        assert response.status_code == 200
+        assert response.content == b"student id"
+        assert response.headers["cache-control"] == "private, no-store"
+
+        other = "documents/other.pdf"
+        assert self.client.get(f"/static/{key}?{sign_private_key(other, 60)}").status_code == 404
+        assert self.client.get(f"/static/{key}?{sign_private_key(key, -1)}").status_code == 404
+
+    def test_range_request(self):
+        """طلبات Range تعيد الجزء المطلوب فقط"""
+        response = self.client.get(f"/static/uploads/{CONTENT_HASH}.webp", headers={"Range": "bytes=10-19"})
+        assert response.status_code == 206
+        assert response.content == b"0123456789"
+        assert response.headers["content-range"] == "bytes 10-19/100"
+
+    def test_other_files_must_revalidate(self):
+        """الملفات العادية تُعاد مراجعتها عبر ETag"""
+        response = self.client.get("/static/app.js", headers={"Accept-Encoding": "identity"})
+        assert response.headers["cache-control"] == "public, no-cache"
+        assert "content-encoding" not in response.headers
+        assert response.headers["vary"] == "Accept-Encoding"
+        cached = self.client.get("/static/app.js", headers={"If-None-Match": response.headers["etag"], "Accept-Encoding": "identity"})
+        assert cached.status_code == 304
+
+    def test_precompressed_variants(self):
+        """يتم إرسال النسخة المضغوطة المبنية مسبقاً عند قبولها"""
+        assert precompress_assets(str(self.directory)) >= 1
+        assert precompress_assets(str(self.directory)) == 0
+        assert (self.directory / "app.js.gz").exists()
+        (self.directory / "app.js.br").write_bytes(b"brotli-bytes")
+
+        response = self.client.get("/static/app.js", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["content-type"].startswith("text/javascript")
+        assert response.text == (self.directory / "app.js").read_text()
+        assert gzip.decompress((self.directory / "app.js.gz").read_bytes()) == (self.directory / "app.js").read_bytes()
+
+        response = self.client.get("/static/app.js", headers={"Accept-Encoding": "gzip, br"})
+        assert response.headers["content-encoding"] == "br"
+
+        response = self.client.get("/static/app.js", headers={"Accept-Encoding": "br;q=0, gzip"})
+        assert response.headers["content-encoding"] == "gzip"
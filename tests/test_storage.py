@@ -0,0 +1,190 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.storage import LocalStorage, S3Storage, storage_key, delete_objects, get_storage
+
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def user_headers():
+    """Auth headers for a real user row (tokens are checked against it)"""
+    from app.auth import create_access_token
+    from app.database import SessionLocal
+    from app.models import User
+    db = SessionLocal()
+    db.query(User).filter(User.email == "storage@example.com").delete(synchronize_session=False)
+    db.add(User(name="Storage User", email="storage@example.com", password="x", is_verified=True))
+    db.commit()
+    yield {"Authorization": f"Bearer {create_access_token({'sub': 'storage@example.com', 'role': 'user'})}"}
+    db.query(User).filter(User.email == "storage@example.com").delete(synchronize_session=False)
+    db.commit()
+    db.close()
+
+
+class TestLocalStorage:
+    """اختبارات التخزين المحلي"""
+
+    def test_save_exists_delete(self, tmp_path):
+        """حفظ الملف وحذفه عبر مفتاح التخزين"""
+        storage = LocalStorage(str(tmp_path / "static"), "https://api.sdotist.org/static/")
+        source = tmp_path / "upload.part"
+        source.write_bytes(b"data")
+
+        asyncio.run(storage.save(str(source), "uploads/ab/cd/file.webp", "image/webp"))
+        assert not source.exists()
+        assert (tmp_path / "static/uploads/ab/cd/file.webp").read_bytes() == b"data"
+        assert asyncio.run(storage.exists("uploads/ab/cd/file.webp"))
+        assert storage.url("uploads/ab/cd/file.webp") == "https://api.sdotist.org/static/uploads/ab/cd/file.webp"
+
+        asyncio.run(storage.delete(["uploads/ab/cd/file.webp", "uploads/missing.webp"]))
+        assert not asyncio.run(storage.exists("uploads/ab/cd/file.webp"))
+        assert storage.presigned_upload("uploads/x.png", "image/png", 1024) is None
+
+    def test_document_links_are_signed(self, tmp_path):
+        """روابط الوثائق الخاصة موقعة ومؤقتة، وروابط الصور عامة"""
+        storage = LocalStorage(str(tmp_path / "static"), "https://api.sdotist.org/static", private_url_expires=60)
+        url = storage.download_url("documents/a.pdf")
+        assert url.startswith("https://api.sdotist.org/static/documents/a.pdf?expires=")
+        assert "&signature=" in url
+        assert storage.download_url("uploads/a.webp") == "https://api.sdotist.org/static/uploads/a.webp"
+
+    def test_rejects_keys_outside_root(self, tmp_path):
+        """المفاتيح لا يمكنها الخروج من مجلد التخزين"""
+        storage = LocalStorage(str(tmp_path / "static"), "https://api.sdotist.org/static")
+        with pytest.raises(ValueError):
+            asyncio.run(storage.exists("../secret.txt"))
+
+    def test_legacy_paths_map_to_keys(self):
+        """المسارات المحلية القديمة تتحول إلى مفاتيح"""
+        assert storage_key("app/static/documents/a.pdf") == "documents/a.pdf"
+        assert storage_key("documents/a.pdf") == "documents/a.pdf"
+
+    def test_presign_endpoint_needs_s3(self, user_headers):
+        """الرفع المباشر غير متاح مع التخزين المحلي"""
+        response = client.post(
+            "/upload/presign", json={"filename": "a.png", "content_type": "image/png"}, headers=user_headers
+        )
+        assert response.status_code == 501
+
+    def test_presign_rejects_revoked_tokens(self, user_headers):
+        """Tokens revoked by a password change cannot presign uploads"""
+        from app.auth import create_access_token
+        from app.database import SessionLocal
+        from app.models import User
+        db = SessionLocal()
+        user = db.query(User).filter(User.email == "storage@example.com").one()
+        user.token_version = 1
+        db.commit()
+        token = create_access_token({"sub": user.email, "role": "user", "uid": user.id, "ver": 0})
+        db.close()
+        response = client.post(
+            "/upload/presign", json={"filename": "a.png", "content_type": "image/png"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code == 401
+
+    def test_presign_rejects_scriptable_types(self, monkeypatch, user_headers):
+        """الرفع المباشر يقبل JPEG و PNG و WebP فقط ويحدد الامتداد بنفسه"""
+        from app.routers import upload as upload_router
+
+        class FakeStorage:
+            def presigned_upload(self, key, content_type, max_size):
+                return {"url": "https://bucket", "fields": {"key": key}}
+
+            def url(self, key):
+                return f"https://cdn.sdotist.org/{key}"
+
+        monkeypatch.setattr(upload_router, "get_storage", lambda: FakeStorage())
+        headers = user_headers
+        for content_type in ("image/svg+xml", "text/html", "image/gif"):
+            response = client.post(
+                "/upload/presign", json={"filename": "a.png", "content_type": content_type}, headers=headers
+            )
+            assert response.status_code == 400
+
+        response = client.post(
+            "/upload/presign", json={"filename": "x.html", "content_type": "image/png"}, headers=headers
+        )
+        assert response.status_code == 200
+        assert response.json()["key"].endswith(".png")
+
+
+class TestS3Storage:
+    """اختبارات التخزين المتوافق مع S3 (باستخدام moto بدلاً من MinIO)"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        moto = pytest.importorskip("moto")
+        monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+        monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+        with moto.mock_aws():
+            self.storage = S3Storage(
+                bucket="sdotist-test", private_bucket="sdotist-test-private",
+                region="us-east-1", public_base_url="https://cdn.sdotist.org",
+            )
+            self.storage.client.create_bucket(Bucket="sdotist-test")
+            self.storage.client.create_bucket(Bucket="sdotist-test-private")
+            yield
+
+    def test_save_exists_delete(self, tmp_path):
+        """رفع الكائن مع ترويسات الـ cache ثم حذفه"""
+        key = f"uploads/ab/cd/{'ab' * 32}.webp"
+        source = tmp_path / "image.part"
+        source.write_bytes(b"webp-bytes")
+
+        asyncio.run(self.storage.save(str(source), key, "image/webp"))
+        assert not source.exists()
+        assert asyncio.run(self.storage.exists(key))
+        head = self.storage.client.head_object(Bucket="sdotist-test", Key=key)
+        assert head["ContentType"] == "image/webp"
+        assert head["CacheControl"] == "public, max-age=31536000, immutable"
+        assert self.storage.url(key) == f"https://cdn.sdotist.org/{key}"
+
+        asyncio.run(self.storage.delete([key, "uploads/missing.webp"]))
+        assert not asyncio.run(self.storage.exists(key))
+
+    def test_documents_go_to_private_bucket(self, tmp_path):
+        """الوثائق تُحفظ في الحاوية الخاصة دون ترويسة cache عامة"""
+        key = "documents/f314893e-4417-408f-b182-3658dc8303bf.pdf"
+        source = tmp_path / "document.part"
+        source.write_bytes(b"%PDF")
+
+        asyncio.run(self.storage.save(str(source), key, "application/pdf"))
+        head = self.storage.client.head_object(Bucket="sdotist-test-private", Key=key)
+        assert head["CacheControl"] == "private, no-store"
+        assert self.storage.client.list_objects_v2(Bucket="sdotist-test").get("KeyCount") == 0
+        assert "sdotist-test-private" in self.storage.download_url(key)
+
+        asyncio.run(self.storage.delete([key]))
+        assert not asyncio.run(self.storage.exists(key))
+
+    def test_presigned_urls(self):
+        """روابط موقعة للتحميل والرفع المباشر"""
+        download = self.storage.download_url("documents/a.pdf")
+        assert "X-Amz-Signature=" in download and "documents/a.pdf" in download
+
+        upload = self.storage.presigned_upload("uploads/direct/a.png", "image/png", 1024)
+        assert upload["fields"]["key"] == "uploads/direct/a.png"
+        assert upload["fields"]["Content-Type"] == "image/png"
+        assert "policy" in upload["fields"]
+
+
+class TestDocumentDeletion:
+    """حذف الوثائق يتم عبر مهمة تخزين في الخلفية"""
+
+    def test_delete_job_accepts_legacy_paths(self, tmp_path, monkeypatch):
+        """مهمة الحذف تعمل مع المسارات القديمة والمفاتيح الجديدة"""
+        from app.config import settings
+        monkeypatch.setattr(settings, "STORAGE_LOCAL_ROOT", str(tmp_path))
+        get_storage.cache_clear()
+        try:
+            (tmp_path / "documents").mkdir()
+            (tmp_path / "documents/old.pdf").write_bytes(b"%PDF")
+            (tmp_path / "documents/new.pdf").write_bytes(b"%PDF")
+            asyncio.run(delete_objects(["app/static/documents/old.pdf", "documents/new.pdf"]))
+            assert list((tmp_path / "documents").iterdir()) == []
+        finally:
+            get_storage.cache_clear()
@@ -0,0 +1,134 @@
+import asyncio
+import io
+import os
+import pytest
+from fastapi import HTTPException, UploadFile
+from fastapi.testclient import TestClient
+from PIL import Image
+from app.main import app
+from app.config import settings
+from app.utils import files
+
+
+client = TestClient(app)
+
+
+class TestStreamingUploads:
+    """اختبارات حفظ الملفات المرفوعة على دفعات"""
+
+    def _upload(self, size: int) -> UploadFile:
+        return UploadFile(io.BytesIO(b"x" * size), filename="photo.png")
+
+    def test_saves_file_in_chunks(self, tmp_path, monkeypatch):
+        """الملف يُكتب على دفعات إلى ملف مؤقت مع حساب الـ hash"""
+        import hashlib
+        monkeypatch.setattr(files, "UPLOAD_CHUNK_SIZE", 1024)
+        size = 10 * 1024 + 5
+        path, digest = asyncio.run(files.spool_upload(self._upload(size), str(tmp_path), 64 * 1024))
+        assert os.path.dirname(path) == str(tmp_path)
+        assert os.path.getsize(path) == size
+        assert digest == hashlib.sha256(b"x" * size).hexdigest()
+
+    def test_oversized_file_aborts_without_leftovers(self, tmp_path, monkeypatch):
+        """تجاوز الحد يوقف الرفع ولا يترك ملفات مؤقتة"""
+        monkeypatch.setattr(files, "UPLOAD_CHUNK_SIZE", 1024)
+        upload = self._upload(8 * 1024)
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(files.spool_upload(upload, str(tmp_path), 4 * 1024))
+        assert error.value.status_code == 400
+        assert os.listdir(tmp_path) == []
+        # Stopped reading at the first chunk past the limit
+        assert upload.file.tell() == 5 * 1024
+
+    def test_upload_endpoint_enforces_limit(self, monkeypatch):
+        """نقطة رفع الصور ترفض الملفات الكبيرة"""
+        monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", 1024)
+        response = client.post("/upload", files={"file": ("big.png", b"\x89PNG" + b"\x00" * 2048, "image/png")})
+        assert response.status_code == 400
+
+
+def _photo(width: int, height: int) -> bytes:
+    """JPEG with camera metadata, like a phone photo"""
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"  # Make
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees on display
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(buffer, "JPEG", exif=exif)
+    return buffer.getvalue()
+
+
+class TestImageProcessing:
+    """اختبارات معالجة الصور المرفوعة"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.created = []
+        yield
+        for url in self.created:
+            path = self._path(url)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _path(self, url: str) -> str:
+        return os.path.join("app/static", url.split("/static/", 1)[1])
+
+    def test_upload_returns_resized_variants_without_exif(self, monkeypatch):
+        """الصورة تُصغّر وتُحذف بياناتها الوصفية وتُنشأ المصغرات"""
+        monkeypatch.setattr(settings, "IMAGE_MAX_DIMENSION", 400)
+        monkeypatch.setattr(settings, "IMAGE_THUMBNAIL_SIZES", [50, 100])
+        response = client.post("/upload", files={"file": ("photo.jpg", _photo(800, 600), "image/jpeg")})
+        assert response.status_code == 200
+        data = response.json()
+        self.created = list(data["variants"].values())
+        assert set(data["variants"]) == {"original", "thumb_50", "thumb_100"}
+        assert data["url"] == data["variants"]["original"]
+
+        sizes = {}
+        for name, url in data["variants"].items():
+            with Image.open(self._path(url)) as image:
+                assert image.format == "WEBP"
+                assert not image.getexif()
+                sizes[name] = image.size
+        # Orientation applied before the metadata was dropped
+        assert sizes == {"original": (300, 400), "thumb_100": (75, 100), "thumb_50": (37, 50)}
+
+    def test_image_pool_started_lazily_without_fork(self):
+        """مجمع معالجة الصور يبدأ عند أول استخدام ولا يعتمد على fork"""
+        from app.utils import images
+        images.shutdown_image_executor()
+        assert images._image_executor is None
+        executor = images.image_executor()
+        assert images.image_executor() is executor
+        assert executor._mp_context.get_start_method() in ("forkserver", "spawn")
+
+    def test_invalid_image_rejected(self):
+        """الملفات غير القابلة للقراءة كصورة تُرفض"""
+        response = client.post("/upload", files={"file": ("fake.png", b"\x89PNG" + b"\x00" * 100, "image/png")})
+        assert response.status_code == 400
+
+    def test_identical_uploads_share_one_stored_object(self, monkeypatch):
+        """رفع نفس الصورة مرتين يعيد نفس الملفات دون معالجة جديدة"""
+        from app.utils import images
+        photo = _photo(64, 48)
+        first = client.post("/upload", files={"file": ("a.jpg", photo, "image/jpeg")}).json()
+        self.created = list(first["variants"].values())
+
+        calls = []
+        monkeypatch.setattr(images, "process_image", lambda *args: calls.append(args))
+        second = client.post("/upload", files={"file": ("b.jpg", photo, "image/jpeg")}).json()
+        assert second == first
+        assert calls == []
+
+        # Sharded by hash: static/uploads/ab/cd/abcd....webp
+        relative = first["url"].split("/static/uploads/", 1)[1]
+        shard_a, shard_b, filename = relative.split("/")
+        assert filename.startswith(shard_a + shard_b)
+        assert len(filename.split(".")[0]) == 64
+
+    def test_content_addressed_files_are_immutable(self):
+        """الملفات المسماة بالـ hash تُخدم مع ترويسة cache دائمة"""
+        data = client.post("/upload", files={"file": ("a.jpg", _photo(32, 32), "image/jpeg")}).json()
+        self.created = list(data["variants"].values())
+        response = client.get(data["variants"]["thumb_160"].replace("https://api.sdotist.org", ""))
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
@@ -40,3 +40,289 @@ class TestUserEndpoints:
         """اختبار الوصول لـ /me بدون تسجيل دخول"""
         response = client.get("/users/me")
         assert response.status_code == 401  # Unauthorized
+
+
+class TestCurrentUserCache:
+    """اختبارات التخزين المؤقت للمستخدم الحالي"""
+
+    email = "cacheuser@example.com"
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        from app.database import SessionLocal
+        from app.models import User
+        from app.auth import create_access_token
+        db = SessionLocal()
+        db.query(User).filter(User.email.like("cacheuser%@example.com")).delete(synchronize_session=False)
+        db.add(User(name="Cache User", email=self.email, password="x", is_verified=True))
+        db.commit()
+        db.close()
+        self.headers = {"Authorization": f"Bearer {create_access_token({'sub': self.email, 'role': 'user'})}"}
+        yield
+        db = SessionLocal()
+        db.query(User).filter(User.email.like("cacheuser%@example.com")).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+    def test_get_me_served_from_cache(self):
+        """اختبار عدم الاستعلام عن المستخدم في الطلبات المتكررة"""
+        from sqlalchemy import event
+        from app.database import engine
+
+        assert client.get("/users/me", headers=self.headers).status_code == 200
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = client.get("/users/me", headers=self.headers)
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+        assert response.status_code == 200
+        assert response.json()["email"] == self.email
+        assert statements == []
+
+    def test_update_me_invalidates_cache(self):
+        """اختبار تحديث البيانات المخزنة بعد تعديل الملف الشخصي"""
+        assert client.get("/users/me", headers=self.headers).json()["name"] == "Cache User"
+        response = client.put("/users/me", json={"name": "Renamed User"}, headers=self.headers)
+        assert response.status_code == 200
+        assert client.get("/users/me", headers=self.headers).json()["name"] == "Renamed User"
+
+    def test_delete_me_invalidates_cache(self):
+        """اختبار حذف المستخدم من الذاكرة المؤقتة بعد حذف الحساب"""
+        assert client.get("/users/me", headers=self.headers).status_code == 200
+        assert client.delete("/users/me", headers=self.headers).status_code == 204
+        assert client.get("/users/me", headers=self.headers).status_code == 404
+
+
+class TestTokenIdentity:
+    """اختبارات ربط الـ Token بمعرف المستخدم"""
+
+    email = "tokenuser@example.com"
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        from app.database import SessionLocal
+        from app.models import User
+        from app.auth import hash_password
+        db = SessionLocal()
+        db.query(User).filter(User.email.like("tokenuser%@example.com")).delete(synchronize_session=False)
+        user = User(name="Token User", email=self.email, password=hash_password("oldpassword1"), is_verified=True)
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        self.user_id = user.id
+        db.close()
+        yield
+        db = SessionLocal()
+        db.query(User).filter(User.email.like("tokenuser%@example.com")).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+    def _headers(self, **claims):
+        from app.auth import create_access_token
+        data = {"sub": self.email, "role": "user", **claims}
+        return {"Authorization": f"Bearer {create_access_token(data)}"}
+
+    def test_login_token_carries_user_id(self):
+        """اختبار احتواء الـ Token على المعرف ونسخة الـ Token"""
+        from app.auth import verify_token
+        response = client.post("/auth/login", data={"username": self.email, "password": "oldpassword1"})
+        assert response.status_code == 200
+        payload = verify_token(response.json()["access_token"], "access")
+        assert payload["uid"] == self.user_id
+        assert payload["ver"] == 0
+
+    def test_id_token_survives_email_change(self):
+        """اختبار استمرار صلاحية الـ Token بعد تغيير البريد"""
+        headers = self._headers(uid=self.user_id, ver=0)
+        response = client.put("/users/me", json={"email": "tokenuser2@example.com"}, headers=headers)
+        assert response.status_code == 200
+        me = client.get("/users/me", headers=headers)
+        assert me.status_code == 200
+        assert me.json()["email"] == "tokenuser2@example.com"
+
+    def test_legacy_email_token_accepted(self):
+        """اختبار قبول الـ Tokens القديمة التي تحتوي البريد فقط"""
+        response = client.get("/users/me", headers=self._headers())
+        assert response.status_code == 200
+        assert response.json()["id"] == self.user_id
+
+    def test_password_change_revokes_old_tokens(self):
+        """اختبار إلغاء الـ Tokens القديمة بعد تغيير كلمة المرور"""
+        headers = self._headers(uid=self.user_id, ver=0)
+        response = client.patch(
+            "/users/me/password",
+            json={"current_password": "oldpassword1", "new_password": "newpassword1"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert client.get("/users/me", headers=headers).status_code == 401
+
+        new_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        assert client.get("/users/me", headers=new_headers).status_code == 200
+
+    def test_password_change_revokes_legacy_refresh_token(self):
+        """اختبار رفض الـ Refresh Token القديم (بدون نسخة) بعد تغيير كلمة المرور"""
+        from app.auth import create_refresh_token
+        legacy_refresh = create_refresh_token({"sub": self.email, "role": "user"})
+        assert client.post("/auth/refresh", json={"refresh_token": legacy_refresh}).status_code == 200
+
+        response = client.patch(
+            "/users/me/password",
+            json={"current_password": "oldpassword1", "new_password": "newpassword1"},
+            headers=self._headers(uid=self.user_id, ver=0),
+        )
+        assert response.status_code == 200
+        assert client.post("/auth/refresh", json={"refresh_token": legacy_refresh}).status_code == 401
+
+    def test_demoted_admin_loses_admin_routes(self):
+        """اختبار فقدان صلاحيات المشرف فوراً بعد تغيير الدور"""
+        from app.database import SessionLocal
+        from app.models import User
+        db = SessionLocal()
+        db.query(User).filter(User.id == self.user_id).update({"role": "admin"})
+        db.commit()
+        headers = self._headers(uid=self.user_id, ver=0, role="admin")
+        assert client.get("/users/admin/dashboard", headers=headers).status_code == 200
+
+        # Demoted by another worker: this worker's user cache still holds the
+        # admin snapshot, but admin routes read the row itself
+        assert client.get("/users/me", headers=headers).status_code == 200
+        db.query(User).filter(User.id == self.user_id).update({"role": "user", "token_version": 1})
+        db.commit()
+        db.close()
+        assert client.get("/users/admin/dashboard", headers=headers).status_code == 401
+
+        # A role claim alone is not enough either
+        assert client.get("/users/admin/dashboard", headers=self._headers(uid=self.user_id, ver=1, role="admin")).status_code == 403
+
+
+class TestBarcodeQr:
+    """اختبارات صور الباركود المخزنة مؤقتاً"""
+
+    email = "qruser@example.com"
+
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, monkeypatch):
+        from app.database import SessionLocal
+        from app.models import User
+        from app.auth import create_access_token
+        from app.config import settings
+        from app.utils import qrcodes
+        monkeypatch.setattr(settings, "QR_CACHE_DIR", str(tmp_path))
+        qrcodes.qr_cache.clear()
+        self.renders = []
+        original = qrcodes._render
+        monkeypatch.setattr(qrcodes, "_render", lambda *args: self.renders.append(args) or original(*args))
+        self.cache_dir = tmp_path
+
+        db = SessionLocal()
+        db.query(User).filter(User.email == self.email).delete(synchronize_session=False)
+        db.add(User(name="QR User", email=self.email, password="x", is_verified=True, barcode_id="qr-barcode-1"))
+        db.commit()
+        db.close()
+        self.headers = {"Authorization": f"Bearer {create_access_token({'sub': self.email, 'role': 'user'})}"}
+        yield
+        db = SessionLocal()
+        db.query(User).filter(User.email == self.email).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+    def test_rendered_once_and_revalidated(self):
+        """الصورة تُنشأ مرة واحدة وتُعاد المراجعة عبر ETag"""
+        from app.utils import qrcodes
+        first = client.get("/users/me/barcode", headers=self.headers)
+        assert first.status_code == 200
+        assert first.headers["content-type"] == "image/png"
+        assert first.headers["cache-control"] == "private, no-cache"
+        assert "qr-barcode-1" not in first.headers["etag"]
+
+        second = client.get("/users/me/barcode", headers=self.headers)
+        assert second.content == first.content
+        assert len(self.renders) == 1
+
+        # A fresh worker finds the image on disk
+        qrcodes.qr_cache.clear()
+        client.get("/users/me/barcode", headers=self.headers)
+        assert len(self.renders) == 1
+
+        cached = client.get("/users/me/barcode", headers={**self.headers, "If-None-Match": first.headers["etag"]})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+    def test_size_and_format(self):
+        """دعم حجم PNG وصيغة SVG"""
+        import io
+        from PIL import Image
+        png = client.get("/users/me/barcode", params={"size": 128}, headers=self.headers)
+        assert Image.open(io.BytesIO(png.content)).size == (128, 128)
+
+        svg = client.get("/users/me/barcode", params={"format": "svg"}, headers=self.headers)
+        assert svg.headers["content-type"] == "image/svg+xml"
+        assert svg.content.lstrip().startswith(b"<")
+        assert svg.headers["etag"] != png.headers["etag"]
+
+        assert client.get("/users/me/barcode", params={"size": 10}, headers=self.headers).status_code == 422
+
+    def test_sizes_are_bucketed(self):
+        """الأحجام تُقرّب لأعلى إلى عدد محدود من القيم"""
+        import io
+        from PIL import Image
+        for size in (100, 101, 127, 128):
+            response = client.get("/users/me/barcode", params={"size": size}, headers=self.headers)
+            assert Image.open(io.BytesIO(response.content)).size == (128, 128)
+        assert len(self.renders) == 1
+        assert len(list(self.cache_dir.iterdir())) == 1
+
+    def test_disk_cache_pruned_by_age_and_count(self):
+        """حذف الملفات القديمة والزائدة من مجلد التخزين المؤقت"""
+        import os
+        import time
+        from app.utils import qrcodes
+        now = time.time()
+        for i in range(5):
+            path = self.cache_dir / f"file{i}.png"
+            path.write_bytes(b"png")
+            os.utime(path, (now - i * 10, now - i * 10))
+        stale = self.cache_dir / "stale.png"
+        stale.write_bytes(b"png")
+        os.utime(stale, (now - 100000, now - 100000))
+
+        assert qrcodes.prune_disk_cache(max_age=86400, max_files=3) == 3
+        assert sorted(p.name for p in self.cache_dir.iterdir()) == ["file0.png", "file1.png", "file2.png"]
+
+    def test_rotation_invalidates_cached_images(self):
+        """تغيير الباركود يحذف الصور المخزنة القديمة"""
+        old = client.get("/users/me/barcode", headers=self.headers)
+        assert len(list(self.cache_dir.iterdir())) == 1
+
+        response = client.post("/users/me/barcode/rotate", headers=self.headers)
+        assert response.status_code == 200
+        assert response.json()["barcode_id"] != "qr-barcode-1"
+        assert list(self.cache_dir.iterdir()) == []
+
+        new = client.get("/users/me/barcode", headers={**self.headers, "If-None-Match": old.headers["etag"]})
+        assert new.status_code == 200
+        assert new.content != old.content
+
+    def test_rotation_on_another_worker_is_seen(self):
+        """الباركود يُقرأ من قاعدة البيانات وليس من ذاكرة المستخدم المؤقتة"""
+        from app.database import SessionLocal
+        from app.models import User
+        old = client.get("/users/me/barcode", headers=self.headers)
+        # Warm this worker's user cache, then rotate behind its back
+        assert client.get("/users/me", headers=self.headers).status_code == 200
+        db = SessionLocal()
+        db.query(User).filter(User.email == self.email).update({"barcode_id": "qr-barcode-2"})
+        db.commit()
+        db.close()
+
+        new = client.get("/users/me/barcode", headers={**self.headers, "If-None-Match": old.headers["etag"]})
+        assert new.status_code == 200
+        assert new.headers["etag"] != old.headers["etag"]
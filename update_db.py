@@ -1,4 +1,5 @@
 from app.database import engine
+from app import models
 from sqlalchemy import text
 
 def add_is_ended_column():
@@ -9,5 +10,69 @@ def add_is_ended_column():
         except Exception as e:
             print(f"Error adding column: {e}")
 
+def add_token_version_column():
+    with engine.begin() as conn:
+        try:
+            conn.execute(text("ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0;"))
+            print("Column 'token_version' added successfully.")
+        except Exception as e:
+            print(f"Error adding column: {e}")
+
+def copy_fcm_tokens_to_device_tokens():
+    """Move the legacy users.fcm_token values into device_tokens"""
+    models.DeviceToken.__table__.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        try:
+            conn.execute(text(
+                "INSERT INTO device_tokens (user_id, token) "
+                "SELECT MAX(id), fcm_token FROM users "
+                "WHERE fcm_token IS NOT NULL "
+                "AND fcm_token NOT IN (SELECT token FROM device_tokens) "
+                "GROUP BY fcm_token;"
+            ))
+            print("FCM tokens copied to device_tokens.")
+        except Exception as e:
+            print(f"Error copying FCM tokens: {e}")
+
+def add_attended_at_column():
+    with engine.begin() as conn:
+        try:
+            conn.execute(text("ALTER TABLE event_registrations ADD COLUMN attended_at TIMESTAMP WITH TIME ZONE;"))
+            print("Column 'attended_at' added successfully.")
+        except Exception as e:
+            print(f"Error adding column: {e}")
+
+def dedupe_event_registrations():
+    """Keep one registration per (event, user) so the unique index can be built"""
+    with engine.begin() as conn:
+        try:
+            conn.execute(text(
+                "UPDATE event_registrations SET attended = TRUE "
+                "WHERE id IN (SELECT MIN(id) FROM event_registrations GROUP BY event_id, user_id "
+                "HAVING MAX(CASE WHEN attended THEN 1 ELSE 0 END) = 1);"
+            ))
+            result = conn.execute(text(
+                "DELETE FROM event_registrations "
+                "WHERE id NOT IN (SELECT MIN(id) FROM event_registrations GROUP BY event_id, user_id);"
+            ))
+            print(f"Removed {result.rowcount} duplicate event registrations.")
+        except Exception as e:
+            print(f"Error removing duplicate registrations: {e}")
+
+def create_missing_indexes():
+    """Create indexes declared in models that existing tables don't have yet"""
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+                print(f"Index '{index.name}' is in place.")
+            except Exception as e:
+                print(f"Error creating index {index.name}: {e}")
+
 if __name__ == "__main__":
     add_is_ended_column()
+    add_token_version_column()
+    copy_fcm_tokens_to_device_tokens()
+    add_attended_at_column()
+    dedupe_event_registrations()
+    create_missing_indexes()